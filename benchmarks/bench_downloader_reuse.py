@@ -0,0 +1,114 @@
+"""Measure per-video setup overhead with fresh vs reused YoutubeDL instances.
+
+Serves small media files from a local keep-alive HTTP server and downloads
+them through yt-dlp's generic extractor, once building a new YoutubeDL per
+video and once through DownloaderPool. Reports time per video and how many
+TCP connections the server accepted.
+
+    python benchmarks/bench_downloader_reuse.py --videos 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+from downloader_engine import DownloaderPool
+
+PAYLOAD = os.urandom(64 * 1024)
+
+
+class MediaHandler(BaseHTTPRequestHandler):
+    """Serves the same payload as video/mp4 for every path"""
+    protocol_version = 'HTTP/1.1'
+    connections = set()
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with MediaHandler.lock:
+            MediaHandler.connections.add(self.client_address)
+
+    def do_HEAD(self):
+        self.send_headers()
+
+    def do_GET(self):
+        self.send_headers()
+        self.wfile.write(PAYLOAD)
+
+    def send_headers(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'video/mp4')
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is expected here
+        pass
+
+
+def ydl_opts(output_dir):
+    return {
+        'quiet': True,
+        'no_warnings': True,
+        'noprogress': True,
+        'outtmpl': {'default': os.path.join(output_dir, '%(id)s.%(ext)s')},
+    }
+
+
+def run_fresh(urls, output_dir):
+    for url in urls:
+        with yt_dlp.YoutubeDL(ydl_opts(output_dir)) as ydl:
+            ydl.extract_info(url, download=True)
+
+
+def run_reused(urls, output_dir):
+    downloaders = DownloaderPool(lambda profile: ydl_opts(output_dir))
+    try:
+        for url in urls:
+            downloaders.get('bench').extract_info(url, download=True)
+    finally:
+        downloaders.close()
+
+
+def measure(name, runner, base_url, videos):
+    urls = [f"{base_url}/{name}/{index}.mp4" for index in range(videos)]
+    MediaHandler.connections = set()
+    with tempfile.TemporaryDirectory() as output_dir:
+        start = time.perf_counter()
+        runner(urls, output_dir)
+        elapsed = time.perf_counter() - start
+    print(f"{name:<7} {elapsed / videos * 1000:8.2f} ms/video  "
+          f"{len(MediaHandler.connections):5d} connections  {elapsed:6.2f}s total")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=200)
+    args = parser.parse_args()
+
+    server = QuietServer(('127.0.0.1', 0), MediaHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    try:
+        measure('fresh', run_fresh, base_url, args.videos)
+        measure('reused', run_reused, base_url, args.videos)
+    finally:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
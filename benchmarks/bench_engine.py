@@ -0,0 +1,276 @@
+"""End-to-end DownloadEngine scenarios against a local fake YouTube.
+
+A local HTTP server serves synthetic flat playlists as JSON pages and media
+files of any size, and a stub YoutubeDL answers playlist URLs from that
+server, fetching pages lazily like YouTube's continuations, while
+downloading videos through yt-dlp's real generic extractor. Each scenario
+runs in its own process so peak RSS is per scenario.
+
+    python benchmarks/bench_engine.py
+    python benchmarks/bench_engine.py --scenario many-playlists --json results.json
+    python benchmarks/bench_engine.py --check baseline.json --tolerance 0.25
+
+Scenarios (--scale multiplies the video counts):
+
+    many-videos     1 playlist x 1,000 videos of 64 KB
+    many-playlists  50 playlists x 20 videos of 64 KB
+    large-file      1 playlist x 1 video of 256 MB
+    long-listing    1 playlist x 2,000 videos of 4 KB, listed slowly
+
+"first" is the time until the first video finished. --check compares wall
+time, time to the first video and peak RSS with a previous --json result and
+exits with status 1 when a scenario is slower or bigger by more than the
+tolerance.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yt_dlp
+import downloader_engine
+
+SCENARIOS = {
+    # name: (playlists, videos per playlist, bytes per video)
+    'many-videos': (1, 1000, 64 * 1024),
+    'many-playlists': (50, 20, 64 * 1024),
+    'large-file': (1, 1, 256 * 1024 * 1024),
+    'long-listing': (1, 2000, 4 * 1024),
+}
+CHUNK = os.urandom(1024 * 1024)
+PAGE_SIZE = 100  # entries per playlist page, as on YouTube
+PAGE_DELAY = 0.05  # seconds the server takes per playlist page
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    """Serves /playlist?list=ID&videos=N&size=BYTES&page=P as flat JSON and /media/ID.mp4?size=BYTES"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_HEAD(self):
+        self.respond(send_body=False)
+
+    def do_GET(self):
+        self.respond(send_body=True)
+
+    def respond(self, send_body):
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        if url.path == '/playlist':
+            time.sleep(PAGE_DELAY)
+            body = json.dumps(self.playlist(query)).encode('utf-8')
+            self.send_headers('application/json', len(body))
+            if send_body:
+                self.wfile.write(body)
+        elif url.path.startswith('/media/'):
+            size = int(query.get('size', 0))
+            self.send_headers('video/mp4', size)
+            if send_body:
+                while size > 0:
+                    self.wfile.write(CHUNK[:size])
+                    size -= len(CHUNK)
+        else:
+            self.send_error(404)
+
+    def playlist(self, query):
+        playlist_id = query['list']
+        size = query.get('size', '0')
+        videos = int(query.get('videos', 0))
+        first = int(query.get('page', 0)) * PAGE_SIZE
+        entries = []
+        for index in range(first, min(first + PAGE_SIZE, videos)):
+            video_id = f"{playlist_id}-{index:05d}"
+            entries.append({
+                'id': video_id,
+                'title': f"Video {index + 1}",
+                'url': f"https://www.youtube.com/watch?v={video_id}&size={size}",
+            })
+        return {'_type': 'playlist', 'id': playlist_id, 'title': f"Playlist {playlist_id}", 'entries': entries,
+                'more': first + PAGE_SIZE < videos}
+
+    def send_headers(self, content_type, length):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(length))
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping idle keep-alive connections is expected here
+        pass
+
+
+class StubYoutubeDL(yt_dlp.YoutubeDL):
+    """Answers YouTube URLs from the fake server and counts extractor calls"""
+    base_url = None
+    playlist_calls = 0
+    video_calls = 0
+    lock = threading.Lock()
+
+    def extract_info(self, url, download=True, *args, **kwargs):
+        parsed = urllib.parse.urlsplit(url)
+        query = dict(urllib.parse.parse_qsl(parsed.query))
+        if parsed.path == '/playlist':
+            with StubYoutubeDL.lock:
+                StubYoutubeDL.playlist_calls += 1
+            first_page = self.fetch_page(parsed.query, 0)
+            return dict(first_page, entries=self.entries(parsed.query, first_page))
+
+        with StubYoutubeDL.lock:
+            StubYoutubeDL.video_calls += 1
+        media_url = f"{self.base_url}/media/{query['v']}.mp4?size={query.get('size', 0)}"
+        return super().extract_info(media_url, download, *args, **kwargs)
+
+    def fetch_page(self, query, page):
+        with urllib.request.urlopen(f"{self.base_url}/playlist?{query}&page={page}") as response:
+            return json.load(response)
+
+    def entries(self, query, first_page):
+        """Yield entries page by page, fetching the next page only when it is reached"""
+        page, info = 0, first_page
+        while True:
+            yield from info['entries']
+            if not info['more']:
+                return
+            page += 1
+            info = self.fetch_page(query, page)
+
+
+def peak_rss():
+    """Peak resident set size of this process in bytes, or None where unsupported"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def run_scenario(name, scale, workers):
+    """Run one scenario in this process and return its measurements"""
+    playlists, videos, size = SCENARIOS[name]
+    videos = max(1, int(videos * scale))
+
+    server = QuietServer(('127.0.0.1', 0), FakeYouTubeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    StubYoutubeDL.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    downloader_engine.yt_dlp.YoutubeDL = StubYoutubeDL
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        # Keep journals, playlist caches and the FFmpeg probe out of the real app data directory
+        downloader_engine.JobJournal.directory = os.path.join(work_dir, 'jobs')
+        downloader_engine.PlaylistCache.directory = os.path.join(work_dir, 'playlists')
+        downloader_engine.FFmpegService.cache_path = os.path.join(work_dir, 'ffmpeg.json')
+        urls = [f"https://www.youtube.com/playlist?list=bench{index}&videos={videos}&size={size}"
+                for index in range(playlists)]
+        first_video = []
+        engine = downloader_engine.DownloadEngine(urls, 'mp4', os.path.join(work_dir, 'out'),
+                                                  max_workers=workers, use_archive=False,
+                                                  resume=False, dedup=False,
+                                                  on_progress=lambda *args: first_video or first_video.append(
+                                                      time.perf_counter()))
+        start = time.perf_counter()
+        summary = engine.run()
+        elapsed = time.perf_counter() - start
+    server.shutdown()
+
+    return {
+        'scenario': name,
+        'playlists': playlists,
+        'videos': summary['total'],
+        'successful': summary['successful'],
+        'wall_time': elapsed,
+        'first_video': first_video[0] - start if first_video else None,
+        'bytes': engine.metrics.bytes_downloaded,
+        'throughput': engine.metrics.bytes_downloaded / elapsed,
+        'videos_per_second': summary['successful'] / elapsed,
+        'peak_rss': peak_rss(),
+        'playlist_calls': StubYoutubeDL.playlist_calls,
+        'video_calls': StubYoutubeDL.video_calls,
+    }
+
+
+def run_isolated(name, scale, workers):
+    """Run a scenario in a fresh interpreter so its peak RSS is its own"""
+    command = [sys.executable, os.path.abspath(__file__), '--run-scenario', name,
+               '--scale', str(scale), '--workers', str(workers)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def print_results(results):
+    print(f"{'scenario':<15} {'videos':>9} {'wall':>8} {'first':>7} {'MB/s':>8} {'videos/s':>9} {'peak RSS':>9} "
+          f"{'pl calls':>8} {'video calls':>11}")
+    for result in results:
+        rss = f"{result['peak_rss'] / 1024 / 1024:.0f} MB" if result['peak_rss'] else 'n/a'
+        first = f"{result['first_video']:6.2f}s" if result.get('first_video') is not None else 'n/a'
+        print(f"{result['scenario']:<15} {result['successful']:>4}/{result['videos']:<4} "
+              f"{result['wall_time']:7.2f}s {first:>7} {result['throughput'] / 1024 / 1024:8.1f} "
+              f"{result['videos_per_second']:9.1f} {rss:>9} {result['playlist_calls']:>8} "
+              f"{result['video_calls']:>11}")
+
+
+def check_regressions(results, baseline_path, tolerance):
+    """Return descriptions of scenarios that got slower or bigger than the baseline"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result['scenario']: result for result in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['scenario'])
+        if previous is None:
+            continue
+        for key in ('wall_time', 'first_video', 'peak_rss'):
+            if result.get(key) and previous.get(key) and result[key] > previous[key] * (1 + tolerance):
+                regressions.append(f"{result['scenario']}: {key} {previous[key]:.4g} -> {result[key]:.4g}")
+        if result['successful'] < previous['successful']:
+            regressions.append(f"{result['scenario']}: only {result['successful']} videos downloaded")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run; may be repeated (default: all)')
+    parser.add_argument('--scale', type=float, default=1.0, help='multiply video counts, e.g. 0.1 for a quick run')
+    parser.add_argument('--workers', type=int, default=downloader_engine.DEFAULT_MAX_WORKERS)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--check', metavar='BASELINE', help='fail on regressions against a previous --json file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown for --check (default: 0.2)')
+    parser.add_argument('--run-scenario', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scenario:
+        print(json.dumps(run_scenario(args.run_scenario, args.scale, args.workers)))
+        return 0
+
+    results = [run_isolated(name, args.scale, args.workers) for name in args.scenario or SCENARIOS]
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        regressions = check_regressions(results, args.check, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Count extractor calls needed to resolve playlists.
+
+Replays a recorded flat playlist extraction through a stand-in for
+yt_dlp.YoutubeDL, so no network access is needed.
+
+    python benchmarks/bench_playlist_resolution.py --playlists 5 --videos 2000
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import downloader_engine
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'playlist_flat.json')
+
+
+class RecordedExtractor:
+    """Replays the recorded playlist fixture and counts extractor work"""
+    playlist_calls = 0
+    video_resolutions = 0
+    fixture = None
+
+    def __init__(self, params=None):
+        self.params = params or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def close(self):
+        pass
+
+    def extract_info(self, url, download=False, process=True):
+        RecordedExtractor.playlist_calls += 1
+        info = copy.deepcopy(RecordedExtractor.fixture)
+        info['webpage_url'] = url
+        if not self.params.get('extract_flat'):
+            # A non-flat extraction resolves every entry individually
+            RecordedExtractor.video_resolutions += len(info['entries'])
+        return info
+
+
+def build_fixture(video_count):
+    """Scale the recorded entries up to the requested playlist size"""
+    with open(FIXTURE_PATH, encoding='utf-8') as f:
+        fixture = json.load(f)
+    template = fixture['entries']
+    entries = []
+    for index in range(video_count):
+        entry = dict(template[index % len(template)])
+        entry['id'] = f"bench{index:06d}"
+        entry['url'] = f"https://www.youtube.com/watch?v={entry['id']}"
+        entry['title'] = f"Benchmark Video {index + 1}"
+        entries.append(entry)
+    fixture['entries'] = entries
+    fixture['playlist_count'] = video_count
+    return fixture
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--playlists', type=int, default=5)
+    parser.add_argument('--videos', type=int, default=2000)
+    args = parser.parse_args()
+
+    RecordedExtractor.fixture = build_fixture(args.videos)
+    downloader_engine.yt_dlp.YoutubeDL = RecordedExtractor
+
+    engine = downloader_engine.DownloadEngine([], 'mp4', '.')
+    start = time.perf_counter()
+    for index in range(args.playlists):
+        playlist = engine.resolve_playlist(f"https://www.youtube.com/playlist?list=PLbench{index}")
+        assert sum(1 for _ in playlist['entries']) == args.videos
+    elapsed = time.perf_counter() - start
+
+    print(f"playlists:                {args.playlists}")
+    print(f"videos per playlist:      {args.videos}")
+    print(f"extractor calls/playlist: {RecordedExtractor.playlist_calls / args.playlists:.2f}")
+    print(f"video resolutions:        {RecordedExtractor.video_resolutions}")
+    print(f"wall time:                {elapsed:.3f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Measure startup time: module import time and time to the first GUI window.
+
+Each case runs in a fresh interpreter, so the times include Python's own
+startup as a user would see it. The GUI case runs on Qt's offscreen
+platform unless QT_QPA_PLATFORM is set, and exits as soon as the window
+has been shown and the event loop is running. Every case uses a throwaway
+home directory; the first repeat fills its caches, like a first launch.
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --repeat 10 --json startup.json
+    python benchmarks/bench_startup.py --check baseline.json --tolerance 0.25
+
+"yt-dlp" tells whether importing yt_dlp had started by the time the case
+finished; the GUI only starts loading it in the background once the window
+is up.
+--check exits with status 1 when a case is slower than the baseline by more
+than the tolerance.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REPORT = "print(json.dumps({'yt_dlp': 'yt_dlp' in sys.modules}), flush=True)"
+CASES = {
+    # name: code run with the repository on sys.path
+    'import-engine': f"import json, sys\nimport downloader_engine\n{REPORT}",
+    'import-cli': f"import json, sys\nimport youtube_downloader_cli\n{REPORT}",
+    'import-gui': f"import json, sys\nimport youtube_downloader\n{REPORT}",
+    'cli-help': "import sys, contextlib, io\nimport youtube_downloader_cli\n"
+                "with contextlib.redirect_stdout(io.StringIO()), contextlib.suppress(SystemExit):\n"
+                "    youtube_downloader_cli.main(['--help'])\n"
+                "import json\n" + REPORT,
+    'gui-window': "import json, os, sys\n"
+                  "from PyQt5.QtCore import QTimer\n"
+                  "from PyQt5.QtWidgets import QApplication\n"
+                  "import youtube_downloader\n"
+                  "app = QApplication(sys.argv)\n"
+                  "window = youtube_downloader.YouTubeDownloaderApp()\n"
+                  "window.show()\n"
+                  "def shown():\n"
+                  f"    {REPORT}\n"
+                  "    # Background checks may still be running; don't wait for them\n"
+                  "    os._exit(0)\n"
+                  "QTimer.singleShot(0, shown)\n"
+                  "app.exec_()\n",
+}
+
+
+def run_case(name, home):
+    """Run a case once in a new interpreter; returns (seconds, whether yt_dlp was loaded)"""
+    env = dict(os.environ, HOME=home, USERPROFILE=home, PYTHONPATH=ROOT)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CASES[name]], env=env, cwd=home,
+                            check=True, capture_output=True, text=True).stdout
+    elapsed = time.perf_counter() - start
+    return elapsed, json.loads(output.strip().splitlines()[-1])['yt_dlp']
+
+
+def measure(name, repeat):
+    """Median and best of several runs of a case sharing one home directory"""
+    with tempfile.TemporaryDirectory() as home:
+        runs = [run_case(name, home) for _ in range(repeat)]
+    times = [elapsed for elapsed, _ in runs]
+    return {
+        'case': name,
+        'median': statistics.median(times),
+        'best': min(times),
+        'first': times[0],
+        'yt_dlp_loaded': runs[-1][1],
+    }
+
+
+def gui_available():
+    return subprocess.run([sys.executable, '-c', 'import PyQt5.QtWidgets'], capture_output=True).returncode == 0
+
+
+def print_results(results):
+    print(f"{'case':<14} {'median':>8} {'best':>8} {'first':>8} {'yt-dlp':>7}")
+    for result in results:
+        print(f"{result['case']:<14} {result['median'] * 1000:6.0f}ms {result['best'] * 1000:6.0f}ms "
+              f"{result['first'] * 1000:6.0f}ms {'yes' if result['yt_dlp_loaded'] else 'no':>7}")
+
+
+def check_regressions(results, baseline_path, tolerance):
+    """Return descriptions of cases that got slower than the baseline"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {result['case']: result for result in json.load(f)}
+    regressions = []
+    for result in results:
+        previous = baseline.get(result['case'])
+        if previous is not None and result['median'] > previous['median'] * (1 + tolerance):
+            regressions.append(f"{result['case']}: median {previous['median']:.3f}s -> {result['median']:.3f}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--case', action='append', choices=sorted(CASES),
+                        help='case to run; may be repeated (default: all)')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per case (default: %(default)s)')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--check', metavar='BASELINE', help='fail on regressions against a previous --json file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown for --check (default: 0.2)')
+    args = parser.parse_args()
+
+    cases = args.case or list(CASES)
+    if not args.case and not gui_available():
+        print("PyQt5 is not installed; skipping the GUI cases")
+        cases = [name for name in cases if 'gui' not in name]
+
+    results = [measure(name, args.repeat) for name in cases]
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.check:
+        regressions = check_regressions(results, args.check, args.tolerance)
+        for regression in regressions:
+            print(f"regression: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,2781 @@
+"""Download engine shared by the GUI and the command-line entry point.
+
+Nothing in this module imports Qt: progress and log messages are reported
+through plain callbacks, which the GUI forwards to its signals.
+"""
+import os
+import re
+import csv
+import json
+import subprocess
+import shutil
+import glob
+import contextlib
+import datetime
+import functools
+import hashlib
+import heapq
+import importlib
+import random
+import threading
+import logging
+import logging.handlers
+import time
+import queue
+import http.server
+import urllib.parse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_MAX_WORKERS = 4
+RESOLVE_WORKERS = 4  # playlists resolved concurrently
+LISTING_BATCH = 20  # videos queued at a time while a playlist is still being listed
+QUEUE_BATCH_SIZE = 25  # queued playlists run together by one DownloadEngine
+PROGRESS_INTERVAL = 0.25  # seconds between byte-level progress updates
+SPEED_SMOOTHING = 0.3  # weight of the newest sample in the smoothed speed
+LOG_FLUSH_INTERVAL_MS = 200  # how often the GUI appends buffered log lines
+PROGRESS_FRAME_MS = 100  # how often the GUI repaints playlist progress from the ProgressBoard
+LOG_MAX_LINES = 5000  # lines kept in the log view
+LOG_MAX_PENDING = 10000  # lines buffered between flushes before the oldest are dropped
+LOG_FILE_MAX_BYTES = 5 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
+MP3_QUALITY = 192  # kbps
+CHECKPOINT_INTERVAL = 1.0  # seconds between job journal writes
+MAX_RETRIES = 3  # extra attempts for a video after a transient failure
+RETRY_BASE_DELAY = 2.0  # seconds before the first retry; doubles with every attempt
+RETRY_MAX_DELAY = 120.0
+RATE_LIMIT_RECOVERY = 10  # successful downloads before concurrency is raised again
+LIMITER_POLL_INTERVAL = 0.5  # longest single sleep while waiting for bandwidth
+METRICS_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)  # seconds
+METRICS_SAMPLE_INTERVAL = 1.0  # seconds between throughput/queue depth samples
+TRANSFER_BLOCK_SIZE = 256 * 1024  # bytes read between progress hooks, bounding cancel latency
+ABORT_POLL_INTERVAL = 0.2  # seconds between cancellation checks while FFmpeg runs
+FFMPEG_MISS_TTL = 600  # seconds a cached "FFmpeg not found" is trusted for the GUI status, while PATH is unchanged
+APP_DATA_DIR = os.path.join(os.path.expanduser('~'), '.youtube_multi_playlist_downloader')
+
+class LazyModule:
+    """Stand-in for a module that is imported on first attribute access
+
+    yt-dlp takes a good part of a second to import, which the GUI window and
+    --help shouldn't wait for. Attributes set on the stand-in take precedence
+    over the module's, which is how the benchmarks swap in a fake YoutubeDL.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Import the module now and return it"""
+        with self._lock:
+            if self._module is None:
+                self._module = importlib.import_module(self._name)
+            return self._module
+
+    def preload(self):
+        """Import the module on a background thread so its first use doesn't wait"""
+        threading.Thread(target=self.load, name=f"preload-{self._name}", daemon=True).start()
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+
+yt_dlp = LazyModule('yt_dlp')
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file, fsync it and move it into place"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path + '.lock', shared with other processes, while the block runs"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + '.lock', 'a+b') as f:
+        lock_file(f)
+        try:
+            yield
+        finally:
+            unlock_file(f)
+
+def lock_file(f, blocking=True):
+    """Take an exclusive lock on an open file that other processes see; returns False if busy and not blocking"""
+    if fcntl is not None:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.05)
+
+def unlock_file(f):
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+    else:
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+class DownloadArchive:
+    """Persistent record of completed videos, keyed by format, output path and playlist
+
+    The file is append-only with one tab-separated key per line and is loaded
+    into a set, so checking a video costs no network round-trip.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(APP_DATA_DIR, 'archive.txt')
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(format_choice, output_path, playlist_id, video_id):
+        return (format_choice, os.path.abspath(output_path), playlist_id, video_id)
+
+    def load(self):
+        """Read the archive file into memory; a missing file is an empty archive"""
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    fields = line.rstrip('\n').split('\t')
+                    if len(fields) == 4:
+                        self._keys.add(tuple(fields))
+        except FileNotFoundError:
+            pass
+        return self
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def remove(self, keys):
+        """Forget videos, e.g. after pruning them; rewrites the archive file"""
+        with self._lock:
+            keys = set(keys) & self._keys
+            if not keys:
+                return
+            self._keys -= keys
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for key in self._keys:
+                    f.write('\t'.join(key) + '\n')
+            os.replace(temp_path, self.path)
+
+    def add(self, key):
+        """Record a completed video and append it to the archive file"""
+        with self._lock:
+            if key in self._keys:
+                return
+            self._keys.add(key)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\t'.join(key) + '\n')
+
+
+class FFmpegInfo:
+    """Resolved FFmpeg installation: path, version string and available encoders"""
+
+    def __init__(self, path=None, version='', encoders=()):
+        self.path = path
+        self.version = version
+        self.encoders = frozenset(encoders)
+
+    @property
+    def available(self):
+        return bool(self.path)
+
+    @property
+    def supports_mp3(self):
+        return 'libmp3lame' in self.encoders
+
+    def to_dict(self):
+        return {'path': self.path, 'version': self.version, 'encoders': sorted(self.encoders)}
+
+
+class FFmpegService:
+    """Discovers FFmpeg once per process and shares the result with the GUI and workers
+
+    The probe result is also persisted so later launches can skip the search and
+    the subprocess calls, as long as the cached executable is unchanged. A
+    "not found" result is persisted too, but only cached() trusts it, and only
+    for FFMPEG_MISS_TTL with the same PATH, so downloads still notice a fresh install.
+    """
+    cache_path = os.path.join(APP_DATA_DIR, 'ffmpeg.json')
+    persist = True
+    _info = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, refresh=False):
+        """Return the cached FFmpegInfo, probing only on first use or when refresh is set"""
+        with cls._lock:
+            if cls._info is None or refresh:
+                info = None if refresh else cls._load_cache()
+                if info is None:
+                    info = cls._probe()
+                    cls._save_cache(info)
+                cls._info = info
+            return cls._info
+
+    @classmethod
+    def cached(cls):
+        """Return the known FFmpegInfo without searching or running FFmpeg, or None"""
+        return cls._info or cls._load_cache(allow_missing=True)
+
+    @staticmethod
+    def find_ffmpeg():
+        """Find FFmpeg executable path"""
+        # Check if ffmpeg is in PATH
+        ffmpeg_path = shutil.which('ffmpeg')
+        if ffmpeg_path:
+            return ffmpeg_path
+            
+        # Check common installation paths for winget installation
+        possible_paths = [
+            os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'WinGet', 'Packages', 'Gyan.FFmpeg.Essentials_*', 'bin', 'ffmpeg.exe'),
+            os.path.join(os.environ.get('PROGRAMFILES', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
+            os.path.join(os.environ.get('PROGRAMFILES(X86)', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
+            'C:\\ffmpeg\\bin\\ffmpeg.exe',
+            os.path.expanduser('~\\ffmpeg\\bin\\ffmpeg.exe'),
+        ]
+        
+        # Expand wildcards and check each path
+        for path_pattern in possible_paths:
+            expanded_paths = glob.glob(path_pattern)
+            for path in expanded_paths:
+                if os.path.exists(path):
+                    return path
+                    
+        return None
+
+    @classmethod
+    def _probe(cls):
+        """Locate FFmpeg and query its version and encoders"""
+        ffmpeg_path = cls.find_ffmpeg()
+        if not ffmpeg_path:
+            return FFmpegInfo()
+
+        try:
+            result = subprocess.run([ffmpeg_path, '-version'],
+                                    capture_output=True, text=True, timeout=10)
+            if result.returncode != 0:
+                return FFmpegInfo()
+            version = result.stdout.splitlines()[0] if result.stdout else ''
+
+            result = subprocess.run([ffmpeg_path, '-hide_banner', '-encoders'],
+                                    capture_output=True, text=True, timeout=10)
+            # Encoder lines look like " A....D libmp3lame   libmp3lame MP3 (MPEG audio layer 3)"
+            matches = (re.match(r'^ [VAS][F.][S.][X.][B.][D.] (\S+)', line) for line in result.stdout.splitlines())
+            encoders = [match.group(1) for match in matches if match and match.group(1) != '=']
+        except (OSError, subprocess.SubprocessError):
+            return FFmpegInfo()
+
+        return FFmpegInfo(ffmpeg_path, version, encoders)
+
+    @classmethod
+    def _fingerprint(cls, path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime]
+
+    @classmethod
+    def _load_cache(cls, allow_missing=False):
+        """Return the persisted FFmpegInfo if the cached executable is unchanged"""
+        if not cls.persist:
+            return None
+        try:
+            with open(cls.cache_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data['path'] is None:
+                recent = time.time() - data['checked'] < FFMPEG_MISS_TTL
+                if allow_missing and recent and data['search_path'] == os.environ.get('PATH', ''):
+                    return FFmpegInfo()
+                return None
+            if data['fingerprint'] != cls._fingerprint(data['path']):
+                return None
+            return FFmpegInfo(data['path'], data['version'], data['encoders'])
+        except (OSError, ValueError, KeyError, TypeError):
+            # Missing, corrupt or stale cache (including a cached "not found"): probe again
+            return None
+
+    @classmethod
+    def _save_cache(cls, info):
+        if not cls.persist:
+            return
+        try:
+            os.makedirs(os.path.dirname(cls.cache_path), exist_ok=True)
+            data = info.to_dict()
+            if info.available:
+                data['fingerprint'] = cls._fingerprint(info.path)
+            else:
+                data.update(checked=time.time(), search_path=os.environ.get('PATH', ''))
+            with open(cls.cache_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+        except OSError:
+            pass
+
+
+class DownloaderPool:
+    """Long-lived YoutubeDL instances, one per worker thread and format profile
+
+    Reusing an instance keeps its extractor setup and HTTP session, so keep-alive
+    connections carry over from one video to the next.
+    """
+
+    def __init__(self, options_factory):
+        self._options_factory = options_factory
+        self._local = threading.local()
+        self._instances = []
+        self._lock = threading.Lock()
+
+    def get(self, profile):
+        """Return this thread's downloader for a profile, creating it on first use"""
+        downloaders = getattr(self._local, 'downloaders', None)
+        if downloaders is None:
+            downloaders = self._local.downloaders = {}
+        ydl = downloaders.get(profile)
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(self._options_factory(profile))
+            downloaders[profile] = ydl
+            with self._lock:
+                self._instances.append(ydl)
+        return ydl
+
+    def close(self):
+        """Close every downloader created so far and release their connections"""
+        with self._lock:
+            instances, self._instances = self._instances, []
+        self._local = threading.local()
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+
+
+class TransferMonitor:
+    """Byte-level progress for every in-flight file, fed by yt-dlp progress hooks
+
+    Speeds are smoothed with an exponential moving average, per-playlist and
+    overall rates are sums of the active transfers' smoothed speeds, and
+    snapshots are pushed to the callback at most once per interval.
+    """
+
+    def __init__(self, callback, interval=PROGRESS_INTERVAL, smoothing=SPEED_SMOOTHING):
+        self.callback = callback
+        self.interval = interval
+        self.smoothing = smoothing
+        self._transfers = {}  # (job, filename) -> transfer dict
+        self._last_emit = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, job, playlist_name, d):
+        """Progress hook body: record one yt-dlp progress dict for a job
+
+        Returns the bytes received since the job's previous update.
+        """
+        key = (job, d.get('filename'))
+        now = time.monotonic()
+        received = 0
+        with self._lock:
+            downloaded = d.get('downloaded_bytes') or 0
+            if d.get('status') != 'downloading':
+                # 'finished' or 'error': the file no longer counts towards live rates
+                transfer = self._transfers.pop(key, None)
+                if transfer is not None:
+                    received = max(downloaded - transfer['downloaded'], 0)
+            else:
+                transfer = self._transfers.get(key)
+                if transfer is None:
+                    # Hooks fire once per block, so at most one block is new; anything
+                    # beyond that was resumed from an earlier partial download
+                    received = min(downloaded, TRANSFER_BLOCK_SIZE)
+                    transfer = self._transfers[key] = {
+                        'playlist': playlist_name,
+                        'title': (d.get('info_dict') or {}).get('title', ''),
+                        'downloaded': downloaded, 'speed': 0.0, 'smoothed_speed': 0.0,
+                        'updated': now,
+                    }
+                else:
+                    received = max(downloaded - transfer['downloaded'], 0)
+                elapsed = now - transfer['updated']
+                if elapsed > 0:
+                    speed = (downloaded - transfer['downloaded']) / elapsed
+                    transfer['speed'] = speed
+                    transfer['smoothed_speed'] += self.smoothing * (speed - transfer['smoothed_speed'])
+                transfer['downloaded'] = downloaded
+                transfer['total'] = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                transfer['updated'] = now
+
+            if now - self._last_emit < self.interval:
+                return received
+            self._last_emit = now
+            snapshot = self._snapshot()
+        self.callback(snapshot)
+        return received
+
+    def finish_job(self, job):
+        """Drop any transfers a job left behind, e.g. after an exception"""
+        with self._lock:
+            for key in [key for key in self._transfers if key[0] == job]:
+                del self._transfers[key]
+
+    def snapshot(self):
+        with self._lock:
+            return self._snapshot()
+
+    def _snapshot(self):
+        playlists = {}
+        for (job, _), transfer in self._transfers.items():
+            smoothed = transfer['smoothed_speed']
+            remaining = max(transfer['total'] - transfer['downloaded'], 0)
+            item = {
+                'job': job,
+                'title': transfer['title'],
+                'downloaded_bytes': transfer['downloaded'],
+                'total_bytes': transfer['total'],
+                'speed': transfer['speed'],
+                'smoothed_speed': smoothed,
+                'eta': remaining / smoothed if smoothed > 0 and transfer['total'] else None,
+                'fraction': min(transfer['downloaded'] / transfer['total'], 1.0) if transfer['total'] else 0.0,
+            }
+            playlist = playlists.setdefault(transfer['playlist'], {'speed': 0.0, 'transfers': []})
+            playlist['speed'] += smoothed
+            playlist['transfers'].append(item)
+        return {
+            'speed': sum(playlist['speed'] for playlist in playlists.values()),
+            'playlists': playlists,
+        }
+
+
+def parse_rate(text):
+    """Parse a rate such as '2M', '500K' or '1.5MB' (per second) into bytes/s; '0' means unlimited"""
+    value = text.strip()
+    if value.lower() in ('', '0', 'unlimited', 'none'):
+        return 0
+    rate = yt_dlp.utils.parse_bytes(re.sub(r'(?i)(?<=[kmgt])b?(?:/s)?$', '', value))
+    if rate is None:
+        raise ValueError(f"invalid rate: {text!r}")
+    return rate
+
+class BandwidthSchedule:
+    """Time-of-day rate limits, e.g. '09:00-18:00=2M,18:00-23:00=8M'
+
+    Windows may wrap past midnight. Outside every window the limiter's own
+    rate applies.
+    """
+
+    def __init__(self, windows):
+        self.windows = windows  # (start minute, end minute, bytes/s)
+
+    @classmethod
+    def parse(cls, spec):
+        windows = []
+        for part in filter(None, (part.strip() for part in spec.split(','))):
+            match = re.fullmatch(r'(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})=(.+)', part)
+            if not match:
+                raise ValueError(f"invalid schedule window: {part!r} (expected HH:MM-HH:MM=RATE)")
+            start_hour, start_minute, end_hour, end_minute = (int(group) for group in match.groups()[:4])
+            if start_hour > 23 or end_hour > 24 or start_minute > 59 or end_minute > 59:
+                raise ValueError(f"invalid time in schedule window: {part!r}")
+            windows.append((start_hour * 60 + start_minute, end_hour * 60 + end_minute, parse_rate(match.group(5))))
+        return cls(windows)
+
+    def rate_at(self, moment):
+        """Rate of the first window containing a datetime, or None"""
+        minute = moment.hour * 60 + moment.minute
+        for start, end, rate in self.windows:
+            if start <= end:
+                inside = start <= minute < end
+            else:
+                inside = minute >= start or minute < end
+            if inside:
+                return rate
+        return None
+
+class BandwidthLimiter:
+    """Token bucket shared by every download worker, so the engine as a whole
+    stays under one rate limit
+
+    Workers call consume() from the yt-dlp progress hook with the bytes they
+    received since their last update, and sleep while the bucket is in debt.
+    The rate can be changed at any time; a schedule overrides it inside its
+    time windows.
+    """
+
+    def __init__(self, rate=0, schedule=None):
+        self._rate = rate  # bytes/s, 0 = unlimited
+        self.schedule = schedule
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._rate = max(0, int(rate))
+
+    def current_rate(self):
+        """Rate in effect right now, taking the schedule into account"""
+        if self.schedule is not None:
+            rate = self.schedule.rate_at(datetime.datetime.now())
+            if rate is not None:
+                return rate
+        return self._rate
+
+    def _refill(self):
+        rate = self.current_rate()
+        now = time.monotonic()
+        if rate:
+            # At most one second's worth of burst
+            self._tokens = min(rate, self._tokens + (now - self._updated) * rate)
+        else:
+            self._tokens = 0.0
+        self._updated = now
+        return rate
+
+    def consume(self, amount, should_stop=None):
+        """Take amount bytes from the bucket, blocking until the debt is paid off
+
+        should_stop() is polled while waiting; returning True ends the wait early.
+        """
+        with self._lock:
+            if not self._refill():
+                return
+            self._tokens -= amount
+        while True:
+            with self._lock:
+                rate = self._refill()
+                if not rate or self._tokens >= 0:
+                    return
+                wait = -self._tokens / rate
+            if should_stop is not None and should_stop():
+                return
+            # Wake up regularly so a raised or lifted limit takes effect mid-wait
+            time.sleep(min(wait, LIMITER_POLL_INTERVAL))
+
+
+class LatencyHistogram:
+    """Durations observed for one phase, summarised as percentiles and Prometheus buckets"""
+
+    def __init__(self):
+        self.samples = []
+
+    def observe(self, seconds):
+        self.samples.append(seconds)
+
+    def percentile(self, fraction):
+        ordered = sorted(self.samples)
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+    def buckets(self):
+        """Cumulative counts for each bound in METRICS_BUCKETS"""
+        return [(bound, sum(1 for sample in self.samples if sample <= bound)) for bound in METRICS_BUCKETS]
+
+    def summary(self):
+        count = len(self.samples)
+        total = sum(self.samples)
+        return {
+            'count': count,
+            'sum': total,
+            'mean': total / count if count else 0.0,
+            'p50': self.percentile(0.5),
+            'p90': self.percentile(0.9),
+            'p99': self.percentile(0.99),
+            'max': max(self.samples, default=0.0),
+        }
+
+class RunMetrics:
+    """Timings, counters and queue depths for one run
+
+    Phases (playlist_info, playlist_listing, resolve, transfer,
+    postprocess:<name>, transcode and video, the end-to-end latency of each
+    video) go into latency
+    histograms. A sampler thread records throughput and queue depths once
+    per interval. The result is written as a JSON run report and can be
+    rendered in the Prometheus text format.
+    """
+
+    def __init__(self, interval=METRICS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.started = time.time()
+        self.finished = None
+        self.bytes_downloaded = 0
+        self.videos = {'downloaded': 0, 'failed': 0, 'retried': 0, 'linked': 0, 'skipped': 0}
+        self.timeline = []  # one sample dict per interval
+        self.gauges = {}  # latest sample of the sampler callback
+        self._histograms = {}
+        self._sampler = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block of code as one observation of a phase"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def observe(self, name, seconds):
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(seconds)
+
+    def count_video(self, result):
+        with self._lock:
+            self.videos[result] += 1
+
+    def add_bytes(self, amount):
+        with self._lock:
+            self.bytes_downloaded += amount
+
+    def start_sampling(self, sampler):
+        """Call sampler() every interval; it returns a dict of gauge values"""
+        self._sampler = sampler
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def _sample_loop(self):
+        last_bytes = 0
+        last_time = time.monotonic()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            gauges = self._sampler()
+            with self._lock:
+                gauges['throughput'] = (self.bytes_downloaded - last_bytes) / (now - last_time)
+                last_bytes, last_time = self.bytes_downloaded, now
+                self.gauges = gauges
+                self.timeline.append(dict(gauges, elapsed=round(time.time() - self.started, 3)))
+
+    def stop(self):
+        self.finished = time.time()
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def report(self, summary=None):
+        """Machine-readable run report"""
+        with self._lock:
+            finished = self.finished or time.time()
+            duration = finished - self.started
+            return {
+                'started': self.started,
+                'finished': finished,
+                'duration': duration,
+                'summary': summary or {},
+                'bytes_downloaded': self.bytes_downloaded,
+                'average_throughput': self.bytes_downloaded / duration if duration > 0 else 0.0,
+                'videos': dict(self.videos),
+                'phases': {name: histogram.summary() for name, histogram in self._histograms.items()},
+                'peak_queue_depths': {name: max((sample.get(name, 0) for sample in self.timeline), default=0)
+                                      for name in ('pending', 'delayed', 'active', 'transcode')},
+                'timeline': list(self.timeline),
+            }
+
+    def write_report(self, path, summary=None):
+        write_json_atomic(os.path.abspath(path), self.report(summary))
+
+    def render_prometheus(self):
+        """Current metrics in the Prometheus text exposition format"""
+        lines = [
+            '# HELP ytdl_phase_seconds Time spent in each phase of a video download',
+            '# TYPE ytdl_phase_seconds histogram',
+        ]
+        with self._lock:
+            for name, histogram in sorted(self._histograms.items()):
+                for bound, count in histogram.buckets():
+                    lines.append(f'ytdl_phase_seconds_bucket{{phase="{name}",le="{bound:g}"}} {count}')
+                lines.append(f'ytdl_phase_seconds_bucket{{phase="{name}",le="+Inf"}} {len(histogram.samples)}')
+                lines.append(f'ytdl_phase_seconds_sum{{phase="{name}"}} {sum(histogram.samples)}')
+                lines.append(f'ytdl_phase_seconds_count{{phase="{name}"}} {len(histogram.samples)}')
+            lines += [
+                '# HELP ytdl_bytes_downloaded_total Bytes received from the network',
+                '# TYPE ytdl_bytes_downloaded_total counter',
+                f'ytdl_bytes_downloaded_total {self.bytes_downloaded}',
+                '# HELP ytdl_videos_total Videos by result',
+                '# TYPE ytdl_videos_total counter',
+            ]
+            lines += [f'ytdl_videos_total{{result="{result}"}} {count}' for result, count in self.videos.items()]
+            lines += [
+                '# HELP ytdl_queue_depth Jobs waiting or running in each queue',
+                '# TYPE ytdl_queue_depth gauge',
+            ]
+            lines += [f'ytdl_queue_depth{{queue="{name}"}} {self.gauges.get(name, 0)}'
+                      for name in ('pending', 'delayed', 'active', 'transcode')]
+            lines += [
+                '# HELP ytdl_throughput_bytes Bytes per second over the last sample interval',
+                '# TYPE ytdl_throughput_bytes gauge',
+                f"ytdl_throughput_bytes {self.gauges.get('throughput', 0.0)}",
+            ]
+        return '\n'.join(lines) + '\n'
+
+class MetricsServer:
+    """Serves RunMetrics at /metrics on localhost while a run is active"""
+
+    def __init__(self, metrics, port, host='127.0.0.1'):
+        self.metrics = metrics
+        self.port = port
+        self.host = host
+        self._server = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return f"http://{self.host}:{self._server.server_address[1]}/metrics"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class LogSink:
+    """Thread-safe log buffer between the download workers and the GUI
+
+    Workers write from their own threads and the GUI drains the buffer in
+    batches on a timer. The buffer is bounded, so a stalled GUI drops the
+    oldest lines instead of growing without limit. Every line can also be
+    streamed to a rotating log file.
+    """
+
+    def __init__(self, max_pending=LOG_MAX_PENDING):
+        self._pending = deque(maxlen=max_pending)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._file_handler = None
+        self._logger = logging.getLogger('youtube_downloader')
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+
+    def enable_file_log(self, path=None, max_bytes=LOG_FILE_MAX_BYTES, backup_count=LOG_FILE_BACKUPS):
+        """Stream every line to a rotating file; returns the log file path"""
+        path = path or os.path.join(APP_DATA_DIR, 'logs', 'downloader.log')
+        self.disable_file_log()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes,
+                                                       backupCount=backup_count, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        self._logger.addHandler(handler)
+        self._file_handler = handler
+        return path
+
+    def disable_file_log(self):
+        if self._file_handler:
+            self._logger.removeHandler(self._file_handler)
+            self._file_handler.close()
+            self._file_handler = None
+
+    def write(self, message, playlist_name="System"):
+        """Queue a message with playlist context; safe to call from any thread"""
+        if playlist_name != "System":
+            message = f"[{playlist_name}] {message}"
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen:
+                self._dropped += 1
+            self._pending.append(message)
+        if self._file_handler:
+            self._logger.info(message)
+
+    def drain(self):
+        """Return and clear the queued lines"""
+        with self._lock:
+            lines = list(self._pending)
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+        if dropped:
+            lines.insert(0, f"… {dropped} log lines skipped")
+        return lines
+
+
+class ProgressBoard:
+    """Thread-safe progress of every playlist, shared between the workers and the GUI
+
+    Takes the engine's on_playlist_start, on_progress and on_transfer callbacks
+    directly. Each only overwrites a playlist's row and marks it changed, so any
+    number of updates between two GUI frames cost a single repaint. Rows are
+    only ever appended, in the order playlists start, until clear().
+    """
+
+    def __init__(self):
+        self._rows = []  # row dicts in the order playlists started
+        self._index = {}  # playlist_name -> row number
+        self._changed = set()  # row numbers changed since the last changes()
+        self._speed = 0.0
+        self._transfers = {'speed': 0.0, 'playlists': {}}  # latest TransferMonitor snapshot
+        self._lock = threading.Lock()
+
+    def _row(self, playlist_name):
+        number = self._index.get(playlist_name)
+        if number is None:
+            number = self._index[playlist_name] = len(self._rows)
+            self._rows.append({'name': playlist_name, 'current': 0, 'total': 0,
+                               'active': 0, 'speed': 0.0, 'eta': None, 'partial': 0.0})
+        self._changed.add(number)
+        return self._rows[number]
+
+    def start_playlist(self, playlist_name, total_videos):
+        """on_playlist_start: add a row, or raise its total as more videos are listed"""
+        with self._lock:
+            self._row(playlist_name)['total'] = total_videos
+
+    def update(self, current, total, percentage, playlist_name):
+        """on_progress: record finished videos of a playlist"""
+        with self._lock:
+            self._row(playlist_name).update(current=current, total=total)
+
+    def update_transfers(self, snapshot):
+        """on_transfer: record active downloads, rates and ETAs from a TransferMonitor snapshot"""
+        playlists = snapshot['playlists']
+        with self._lock:
+            self._speed = snapshot['speed']
+            self._transfers = snapshot
+            for name, number in self._index.items():
+                row = self._rows[number]
+                playlist = playlists.get(name)
+                if playlist is None and not row['active']:
+                    continue
+                transfers = playlist['transfers'] if playlist else []
+                etas = [item['eta'] for item in transfers if item['eta'] is not None]
+                row.update(active=len(transfers), speed=playlist['speed'] if playlist else 0.0,
+                           eta=max(etas) if etas else None,
+                           partial=sum(item['fraction'] for item in transfers))
+                self._changed.add(number)
+
+    def changes(self):
+        """Return the row count and copies of the rows changed since the last call, by row number"""
+        with self._lock:
+            changed = {number: dict(self._rows[number]) for number in self._changed}
+            self._changed.clear()
+            return len(self._rows), changed
+
+    @property
+    def speed(self):
+        """Overall smoothed speed in bytes/s"""
+        return self._speed
+
+    def transfers(self, playlist_name):
+        """Active transfers of a playlist from the latest snapshot"""
+        with self._lock:
+            playlist = self._transfers['playlists'].get(playlist_name)
+            return list(playlist['transfers']) if playlist else []
+
+    def clear(self):
+        with self._lock:
+            self._rows = []
+            self._index = {}
+            self._changed.clear()
+            self._speed = 0.0
+            self._transfers = {'speed': 0.0, 'playlists': {}}
+
+
+class JobJournal:
+    """Crash-safe per-video state for a batch, so an interrupted run can resume
+
+    A batch is identified by its format, output path and playlist URLs. A new
+    batch takes over the progress of its playlists from other journals with the
+    same format and folder, since queue batches are rebuilt from whatever is
+    pending. The journal is rewritten atomically (temporary file + os.replace)
+    at most once per CHECKPOINT_INTERVAL, and immediately whenever a playlist
+    finishes.
+    """
+    PENDING = 'pending'
+    DOWNLOADING = 'downloading'
+    CONVERTING = 'converting'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    directory = os.path.join(APP_DATA_DIR, 'jobs')
+
+    def __init__(self, path, data):
+        self.path = path
+        self.data = data
+        self._videos = {}  # (playlist_url, position) -> video record
+        for url, playlist in data['playlists'].items():
+            for video in playlist['videos']:
+                self._videos[(url, video['position'])] = video
+        self._dirty = False
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_id(playlist_urls, format_choice, output_path):
+        signature = json.dumps([format_choice, os.path.abspath(output_path), list(playlist_urls)])
+        return hashlib.sha1(signature.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def playlist_key(url):
+        """Playlist ID of a URL, so any URL form of a playlist matches its journal entry"""
+        try:
+            return normalize_playlist_url(url)[0]
+        except ValueError:
+            return url
+
+    @classmethod
+    def open(cls, playlist_urls, format_choice, output_path, resume=True):
+        """Load the journal for this batch, or start a fresh one"""
+        path = os.path.join(cls.directory, cls.job_id(playlist_urls, format_choice, output_path) + '.json')
+        if resume:
+            journal = cls.load(path)
+            if journal is not None:
+                return journal
+        data = {
+            'version': 1,
+            'format': format_choice,
+            'output_path': output_path,
+            'playlist_urls': list(playlist_urls),
+            'created': time.time(),
+            'updated': time.time(),
+            'playlists': {},
+        }
+        journal = cls(path, data)
+        if resume:
+            journal.adopt_playlists()
+        return journal
+
+    def adopt_playlists(self):
+        """Move this batch's playlists out of other journals of the same format and folder"""
+        wanted = {self.playlist_key(url): url for url in self.data['playlist_urls']}
+        output_path = os.path.abspath(self.data['output_path'])
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            other = self.load(path)
+            if (other is None or other.path == self.path or other.data['format'] != self.data['format']
+                    or os.path.abspath(other.data['output_path']) != output_path):
+                continue
+            moved = [url for url in other.data['playlists'] if wanted.get(self.playlist_key(url)) is not None
+                     and wanted[self.playlist_key(url)] not in self.data['playlists']]
+            if not moved:
+                continue
+            with self._lock:
+                for url in moved:
+                    mine = wanted[self.playlist_key(url)]
+                    playlist = self.data['playlists'][mine] = other.data['playlists'][url]
+                    for video in playlist['videos']:
+                        self._videos[(mine, video['position'])] = video
+                self._dirty = True
+            other.drop_playlists(moved)
+        self.checkpoint(force=True)
+
+    def drop_playlists(self, urls):
+        """Forget playlists that need no resuming; the journal is deleted once none are left"""
+        with self._lock:
+            dropped = [url for url in urls if url in self.data['playlists']]
+            if not dropped:
+                return
+            for url in dropped:
+                del self.data['playlists'][url]
+            self.data['playlist_urls'] = [url for url in self.data['playlist_urls'] if url not in dropped]
+            self._videos = {key: video for key, video in self._videos.items() if key[0] not in dropped}
+            self._dirty = True
+            empty = not self.data['playlists']
+        if empty:
+            self.discard()
+        else:
+            self.checkpoint(force=True)
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return cls(path, json.load(f))
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    @classmethod
+    def latest_unfinished(cls):
+        """Return the most recently updated journal left behind by an interrupted run"""
+        journals = []
+        for path in glob.glob(os.path.join(cls.directory, '*.json')):
+            journal = cls.load(path)
+            if journal is not None:
+                journals.append(journal)
+        return max(journals, key=lambda journal: journal.data['updated'], default=None)
+
+    @property
+    def is_resumed(self):
+        return bool(self.data['playlists'])
+
+    def playlist(self, url):
+        return self.data['playlists'].get(url)
+
+    def progress(self):
+        """Return (done, total) video counts across the batch"""
+        with self._lock:
+            done = sum(1 for video in self._videos.values() if video['state'] == self.DONE)
+            return done, len(self._videos)
+
+    def set_playlist(self, url, playlist_id, title):
+        """Record a playlist whose listing has just started; videos are added as they are listed"""
+        with self._lock:
+            self.data['playlists'][url] = {
+                'id': playlist_id, 'title': title, 'archived': 0,
+                'status': 'resolved', 'listed': False, 'videos': [],
+            }
+            # Drop the videos of an earlier listing that was interrupted
+            self._videos = {key: video for key, video in self._videos.items() if key[0] != url}
+            self._dirty = True
+        self.checkpoint(force=True)
+
+    def add_videos(self, url, entries):
+        """Record newly listed videos as pending; positions already in the journal are left alone"""
+        with self._lock:
+            playlist = self.data['playlists'][url]
+            for position, video_id, video_url in entries:
+                if (url, position) in self._videos:
+                    continue
+                video = {'position': position, 'id': video_id, 'url': video_url, 'state': self.PENDING}
+                playlist['videos'].append(video)
+                self._videos[(url, position)] = video
+                self._dirty = True
+        self.checkpoint()
+
+    def finish_listing(self, url, archived):
+        """Mark a playlist as completely listed, so a resumed run does not list it again"""
+        with self._lock:
+            playlist = self.data['playlists'][url]
+            playlist['listed'] = True
+            playlist['archived'] = archived
+            self._dirty = True
+        self.checkpoint(force=True)
+
+    def mark(self, url, position, state):
+        with self._lock:
+            video = self._videos.get((url, position))
+            if video is not None and video['state'] != state:
+                video['state'] = state
+                self._dirty = True
+
+    def finish_playlist(self, url):
+        """Mark a playlist done once every video is; failed videos keep it resumable"""
+        with self._lock:
+            playlist = self.data['playlists'].get(url)
+            if (playlist and playlist.get('listed', True)
+                    and all(video['state'] == self.DONE for video in playlist['videos'])):
+                playlist['status'] = self.DONE
+                self._dirty = True
+        self.checkpoint(force=True)
+
+    def checkpoint(self, force=False):
+        """Write the journal atomically if it changed and the interval has passed"""
+        with self._lock:
+            now = time.monotonic()
+            if not self._dirty or (not force and now - self._last_write < CHECKPOINT_INTERVAL):
+                return
+            self.data['updated'] = time.time()
+            write_json_atomic(self.path, self.data)
+            self._dirty = False
+            self._last_write = now
+
+    def discard(self):
+        """Delete the journal once the batch has completed"""
+        with self._lock:
+            self.data['playlists'] = {}
+            self._videos = {}
+            self._dirty = False
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class VideoAborted(Exception):
+    """Raised from yt-dlp hooks and FFmpeg waits to stop a video that was cancelled or skipped"""
+
+
+@functools.lru_cache(maxsize=None)
+def _cancelled_download_type():
+    # Built on first use so importing this module doesn't import yt-dlp
+    return type('VideoAborted', (VideoAborted, yt_dlp.utils.DownloadCancelled), {})
+
+
+def download_aborted(message):
+    """A VideoAborted that yt-dlp also treats as a cancelled download, for raising from its hooks"""
+    return _cancelled_download_type()(message)
+
+
+def transcode_to_mp3(ffmpeg_path, source_path, quality=MP3_QUALITY, should_abort=None):
+    """Encode an audio file to MP3 beside the source, remove the source and return the MP3 path
+
+    should_abort() is polled while FFmpeg runs; returning True kills it and
+    raises VideoAborted.
+    """
+    target_path = os.path.splitext(source_path)[0] + '.mp3'
+    if os.path.normcase(source_path) == os.path.normcase(target_path):
+        return target_path
+
+    temp_path = target_path + '.part'
+    command = [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y',
+               '-i', source_path, '-vn', '-codec:a', 'libmp3lame', '-b:a', f'{quality}k',
+               '-f', 'mp3', temp_path]
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    while True:
+        try:
+            _, stderr = process.communicate(timeout=ABORT_POLL_INTERVAL)
+            break
+        except subprocess.TimeoutExpired:
+            if should_abort is not None and should_abort():
+                process.kill()
+                process.communicate()
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise VideoAborted("MP3 conversion cancelled")
+
+    if process.returncode != 0:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        error_lines = stderr.strip().splitlines()
+        raise RuntimeError(error_lines[-1] if error_lines else f"FFmpeg exited with code {process.returncode}")
+
+    os.replace(temp_path, target_path)
+    os.remove(source_path)
+    return target_path
+
+
+class TranscodePipeline:
+    """Second pipeline stage that encodes downloaded audio to MP3 while downloads continue
+
+    Download workers put finished files on a bounded queue, blocking when the
+    encoders fall behind. One thread per CPU core takes files off the queue and
+    runs each encode in its own FFmpeg process, so encoding uses every core and
+    never holds a download slot.
+    """
+
+    def __init__(self, ffmpeg_path, on_done, workers=None, queue_size=None, metrics=None, should_abort=None):
+        self.ffmpeg_path = ffmpeg_path
+        self.should_abort = should_abort  # should_abort(item): stop this item's encode early
+        self.metrics = metrics  # RunMetrics, timing each encode as the 'transcode' phase
+        self.on_done = on_done  # on_done(item, mp3_path, error), error is None on success
+        self.workers = workers or os.cpu_count() or 1
+        self._queue = queue.Queue(maxsize=queue_size or self.workers * 2)
+        self._threads = []
+        self._cancelled = threading.Event()
+
+    def start(self):
+        for _ in range(self.workers):
+            thread = threading.Thread(target=self._work, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item, source_path):
+        """Queue a downloaded file; blocks while the queue is full"""
+        self._queue.put((item, source_path))
+
+    def close(self):
+        """Wait for queued files to be encoded, then stop the workers"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def cancel(self):
+        """Drop files that are still waiting and kill the encodes that are running"""
+        self._cancelled.set()
+        dropped = []
+        shutdowns = 0
+        try:
+            while True:
+                task = self._queue.get_nowait()
+                if task is None:
+                    shutdowns += 1
+                else:
+                    dropped.append(task)
+        except queue.Empty:
+            pass
+        # Put back the shutdown markers close() may have queued, or its workers never exit
+        for _ in range(shutdowns):
+            self._queue.put(None)
+        for item, _ in dropped:
+            self.on_done(item, None, VideoAborted("MP3 conversion cancelled"))
+
+    def _work(self):
+        while True:
+            task = self._queue.get()
+            if task is None:
+                return
+            item, source_path = task
+            start = time.perf_counter()
+
+            def should_abort():
+                return self._cancelled.is_set() or (self.should_abort is not None and self.should_abort(item))
+
+            try:
+                target_path = transcode_to_mp3(self.ffmpeg_path, source_path, should_abort=should_abort)
+            except Exception as e:
+                self.on_done(item, None, e)
+            else:
+                if self.metrics is not None:
+                    self.metrics.observe('transcode', time.perf_counter() - start)
+                self.on_done(item, target_path, None)
+
+
+def link_file(source_path, link_path):
+    """Hardlink a file into place, falling back to a symlink, then to a copy"""
+    try:
+        os.link(source_path, link_path)
+    except OSError:
+        try:
+            os.symlink(os.path.abspath(source_path), link_path)
+        except OSError:
+            shutil.copy2(source_path, link_path)
+
+class ContentStore:
+    """One shared copy of each downloaded video, linked into every playlist folder that lists it
+
+    Files are keyed by video ID and kept in a per-format directory under the
+    output folder (so hardlinks stay on one filesystem), with an index of
+    the file name each one had when it was downloaded. While a video is
+    being downloaded for one playlist, workers wanting it for another wait
+    for that download instead of starting their own.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, 'index.json')
+        self._files = {}  # video_id -> {'file', 'filename', 'size'}
+        self._claims = {}  # video_id -> Event set when its download settles
+        self._cancelled = False
+        self.linked = 0
+        self.saved_bytes = 0
+        self._lock = threading.Lock()
+
+    def load(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self._files = json.load(f)
+        except (OSError, ValueError):
+            self._files = {}
+        return self
+
+    def claim(self, video_id):
+        """Return the stored entry for a video, or None when the caller should download it
+
+        A None result must be settled with add() or release().
+        """
+        while True:
+            with self._lock:
+                entry = self._files.get(video_id)
+                if entry is not None and os.path.exists(os.path.join(self.directory, entry['file'])):
+                    return entry
+                if self._cancelled:
+                    return None
+                event = self._claims.get(video_id)
+                if event is None:
+                    self._claims[video_id] = threading.Event()
+                    return None
+            event.wait()
+
+    def release(self, video_id):
+        """Give up a claim, e.g. after a failed download, waking anyone waiting for it"""
+        with self._lock:
+            event = self._claims.pop(video_id, None)
+        if event is not None:
+            event.set()
+
+    def cancel(self):
+        """Wake every waiting worker; used when the run is stopped"""
+        with self._lock:
+            self._cancelled = True
+            events = list(self._claims.values())
+            self._claims.clear()
+        for event in events:
+            event.set()
+
+    def add(self, video_id, filepath):
+        """Move a finished download into the store and link it back into its playlist folder"""
+        safe_id = re.sub(r'[^\w-]', '_', video_id)
+        stored_name = safe_id + os.path.splitext(filepath)[1]
+        stored_path = os.path.join(self.directory, stored_name)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            os.replace(filepath, stored_path)
+            link_file(stored_path, filepath)
+            with self._lock:
+                self._files[video_id] = {
+                    'file': stored_name,
+                    'filename': os.path.basename(filepath),
+                    'size': os.path.getsize(stored_path),
+                }
+                write_json_atomic(self.index_path, self._files)
+        finally:
+            self.release(video_id)
+
+    def link(self, entry, folder):
+        """Link a stored video into a playlist folder and count the bytes saved"""
+        stored_path = os.path.join(self.directory, entry['file'])
+        link_path = os.path.join(folder, entry['filename'])
+        if os.path.lexists(link_path):
+            if os.path.exists(link_path) and os.path.samefile(stored_path, link_path):
+                return link_path
+            os.remove(link_path)
+        link_file(stored_path, link_path)
+        with self._lock:
+            self.linked += 1
+            self.saved_bytes += entry['size']
+        return link_path
+
+
+class PlaylistCache:
+    """Flat playlist listings cached on disk, for TTL reuse and sync change detection
+
+    Each snapshot keeps the entries (position, id, title, url), when they were
+    fetched, and synced_ids: the videos a sync run has already handled, so a
+    video that failed is offered again by the next sync.
+    """
+    directory = os.path.join(APP_DATA_DIR, 'playlists')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest()[:16] + '.json')
+
+    def load(self, url):
+        try:
+            with open(self._path(url), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, url, playlist, synced_ids):
+        """Store a freshly fetched listing and return the snapshot"""
+        snapshot = {
+            'url': url,
+            'id': playlist['id'],
+            'title': playlist['title'],
+            'fetched': time.time(),
+            'entries': [{'position': position, 'id': video_id, 'title': title, 'url': video_url}
+                        for position, video_id, title, video_url in playlist['entries']],
+            'synced_ids': list(synced_ids),
+        }
+        with self._lock:
+            write_json_atomic(self._path(url), snapshot)
+        return snapshot
+
+    def mark_synced(self, url, failed_ids=()):
+        """Record every listed video except failed ones as handled by a sync"""
+        with self._lock:
+            snapshot = self.load(url)
+            if snapshot is None:
+                return
+            failed_ids = set(failed_ids)
+            snapshot['synced_ids'] = [entry['id'] for entry in snapshot['entries'] if entry['id'] not in failed_ids]
+            write_json_atomic(self._path(url), snapshot)
+
+
+class PlaylistState:
+    """Per-playlist bookkeeping shared by the download workers"""
+
+    def __init__(self, url, name, playlist_id, archived=0):
+        self.url = url
+        self.name = name
+        self.playlist_id = playlist_id
+        # (playlist position, video_id, video_url) for every video still to download;
+        # grows while the playlist is being listed
+        self.entries = []
+        self.archived = archived
+        self.total = 0
+        # True (downloaded), False (failed) or None (not attempted), in playlist order
+        self.results = []
+        self.attempts = []  # retries used per video
+        self.started = []  # perf_counter() of each video's first attempt
+        self.claims = set()  # slots whose job holds the video's ContentStore claim
+        self.completed = 0
+        self.successful = 0
+        self.skipped = 0
+        self.listed = False  # no more videos will be added
+        self.partial = False  # listing stopped early, so some videos were never seen
+        self._lock = threading.Lock()
+
+    def add_entries(self, entries):
+        """Append newly listed videos; returns their slots"""
+        with self._lock:
+            first = len(self.entries)
+            self.entries.extend(entries)
+            self.results.extend([None] * len(entries))
+            self.attempts.extend([0] * len(entries))
+            self.started.extend([None] * len(entries))
+            self.total = len(self.entries)
+            return range(first, self.total)
+
+    def drop_claim(self, slot):
+        """Forget a slot's ContentStore claim; returns whether it held one"""
+        with self._lock:
+            held = slot in self.claims
+            self.claims.discard(slot)
+            return held
+
+    def finish_listing(self, complete=True):
+        """Stop adding videos; returns whether every listed video already has a result"""
+        with self._lock:
+            self.listed = True
+            self.partial = not complete
+            return self.completed == self.total
+
+    def record(self, slot, success):
+        """Store a video's result, None for skipped; returns (completed count, whether the playlist just finished)"""
+        with self._lock:
+            self.results[slot] = success
+            self.completed += 1
+            if success:
+                self.successful += 1
+            elif success is None:
+                self.skipped += 1
+            return self.completed, self.listed and self.completed == self.total
+
+
+class RoundRobinScheduler:
+    """Hands out download jobs one playlist at a time, so a 1,000-video
+    playlist can't starve the short ones queued behind it
+
+    Failed jobs can be put back with a delay, and the number of jobs handed
+    out at once is capped by a concurrency limit that backs off on rate
+    limiting and creeps back up as downloads succeed again.
+    """
+
+    def __init__(self, concurrency=DEFAULT_MAX_WORKERS):
+        self._queues = OrderedDict()  # PlaylistState -> deque of entry slots
+        self._delayed = []  # heap of (ready time, sequence, state, slot)
+        self._sequence = 0
+        self._condition = threading.Condition()
+        self._closed = False
+        self._cancelled = False
+        self._active = 0  # jobs handed out and not yet marked done
+        self.max_concurrency = concurrency
+        self.concurrency = concurrency
+        self._successes = 0  # since the concurrency limit was last changed
+        self._throttled_at = float('-inf')
+
+    def add_jobs(self, state, slots):
+        """Queue videos of a playlist; a playlist still being listed adds more as they arrive"""
+        with self._condition:
+            if self._cancelled:
+                return
+            self._queues.setdefault(state, deque()).extend(slots)
+            self._condition.notify_all()
+
+    def retry(self, state, slot, delay):
+        """Queue a job again once delay seconds have passed"""
+        with self._condition:
+            if self._cancelled:
+                return
+            self._sequence += 1
+            heapq.heappush(self._delayed, (time.monotonic() + delay, self._sequence, state, slot))
+            self._condition.notify_all()
+
+    def throttle(self):
+        """Halve the concurrency limit after rate limiting; returns the new limit
+
+        Workers that were already running hit the same limit together, so the
+        limit is lowered at most once per RETRY_BASE_DELAY and None is returned
+        for the rest.
+        """
+        with self._condition:
+            now = time.monotonic()
+            if now - self._throttled_at < RETRY_BASE_DELAY:
+                return None
+            self._throttled_at = now
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+            return self.concurrency
+
+    def relax(self):
+        """Count a success; every RATE_LIMIT_RECOVERY successes allow one more parallel job
+
+        Returns the new limit when it was raised, otherwise None.
+        """
+        with self._condition:
+            if self.concurrency >= self.max_concurrency:
+                return None
+            self._successes += 1
+            if self._successes < RATE_LIMIT_RECOVERY:
+                return None
+            self._successes = 0
+            self.concurrency += 1
+            self._condition.notify_all()
+            return self.concurrency
+
+    def close(self):
+        """No more playlists will be added; workers exit once the queues are empty"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def cancel(self):
+        """Drop every queued job and release waiting workers"""
+        with self._condition:
+            self._cancelled = True
+            self._closed = True
+            self._queues.clear()
+            self._delayed.clear()
+            self._condition.notify_all()
+
+    def next_job(self):
+        """Block until a job is available; returns (state, slot) or None when done
+
+        Every job returned must be reported back with task_done().
+        """
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    _, _, state, slot = heapq.heappop(self._delayed)
+                    self._queues.setdefault(state, deque()).append(slot)
+
+                if self._queues and self._active < self.concurrency:
+                    break
+                if self._closed and not self._queues and not self._delayed and not self._active:
+                    return None
+                # A job still running may fail and be retried, so wait for it too
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                self._condition.wait(timeout)
+
+            state, queue = next(iter(self._queues.items()))
+            slot = queue.popleft()
+            if queue:
+                self._queues.move_to_end(state)
+            else:
+                del self._queues[state]
+            self._active += 1
+            return state, slot
+
+    def remove_playlist(self, state):
+        """Drop a playlist's queued and delayed jobs; returns the dropped slots"""
+        with self._condition:
+            slots = list(self._queues.pop(state, ()))
+            delayed = [job for job in self._delayed if job[2] is state]
+            if delayed:
+                self._delayed = [job for job in self._delayed if job[2] is not state]
+                heapq.heapify(self._delayed)
+                slots += [job[3] for job in delayed]
+            self._condition.notify_all()
+            return slots
+
+    def depths(self):
+        """Queued, delayed (waiting to be retried) and running job counts"""
+        with self._condition:
+            return {
+                'pending': sum(len(queue) for queue in self._queues.values()),
+                'delayed': len(self._delayed),
+                'active': self._active,
+            }
+
+    def task_done(self):
+        with self._condition:
+            self._active -= 1
+            self._condition.notify_all()
+
+def iter_playlist_entries(entries):
+    """Yield compact (position, video_id, title, url) records from flat playlist entries
+
+    Only these fields are kept, so listing a channel with thousands of videos
+    does not hold every entry's info dict in memory.
+    """
+    position = 0
+    for entry in entries:
+        if not entry or 'url' not in entry:
+            continue
+        position += 1
+        yield position, entry.get('id') or entry['url'], entry.get('title') or '', entry['url']
+
+
+def format_bytes(num_bytes):
+    """Human-readable byte count, e.g. 3.4 MB"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(num_bytes) < 1024:
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+def format_eta(seconds):
+    """Format a duration in seconds as H:MM:SS or M:SS"""
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+TRANSIENT = 'transient'
+RATE_LIMITED = 'rate_limited'
+PERMANENT = 'permanent'
+
+RATE_LIMIT_ERRORS = re.compile(r"HTTP Error 429|Too Many Requests|rate.?limit|confirm you.re not a bot", re.I)
+PERMANENT_ERRORS = re.compile(
+    r"Private video|Video unavailable|video is (?:no longer )?unavailable|has been removed|"
+    r"copyright|members-only|Join this channel|confirm your age|not available in your country|"
+    r"HTTP Error 40[14]|HTTP Error 410|Unsupported URL", re.I)
+
+def classify_error(message):
+    """Sort a yt-dlp error into RATE_LIMITED, PERMANENT or TRANSIENT
+
+    Anything not recognised (timeouts, 5xx, dropped connections) is treated
+    as transient, so it is retried a bounded number of times.
+    """
+    if RATE_LIMIT_ERRORS.search(message):
+        return RATE_LIMITED
+    if PERMANENT_ERRORS.search(message):
+        return PERMANENT
+    return TRANSIENT
+
+def retry_delay(attempt, rate_limited=False):
+    """Exponential backoff with jitter for the given retry attempt (1-based)"""
+    delay = RETRY_BASE_DELAY * 2 ** (attempt - 1)
+    if rate_limited:
+        delay *= 4
+    return min(delay, RETRY_MAX_DELAY) * random.uniform(0.5, 1.0)
+
+def _ignore(*args):
+    pass
+
+class DownloadEngine:
+    """Downloads a batch of playlists; reports through plain callbacks so it runs without Qt
+
+    Callbacks mirror the GUI signals and may be called from any worker thread:
+    on_progress(current, total, percentage, playlist_name), on_log(message, playlist_name),
+    on_finished(success, message, playlist_name), on_playlist_start(playlist_name, total_videos)
+    and on_transfer(snapshot).
+    """
+
+    def __init__(self, playlist_urls, format_choice, output_path, max_workers=DEFAULT_MAX_WORKERS,
+                 use_archive=True, resume=True, metadata_ttl=0, sync=False, prune=False,
+                 rate_limit=0, schedule=None, dedup=True, report_path=None, metrics_port=None,
+                 on_progress=None, on_log=None, on_finished=None,
+                 on_playlist_start=None, on_transfer=None):
+        self.playlist_urls = playlist_urls
+        self.format_choice = format_choice
+        self.output_path = output_path
+        self.max_workers = max(1, int(max_workers))
+        self.use_archive = use_archive
+        self.resume = resume
+        self.metadata_ttl = metadata_ttl  # seconds a cached playlist listing is reused
+        self.sync = sync  # only download videos added since the last sync
+        self.prune = prune  # delete files of videos removed from the playlist (sync only)
+        self.playlist_cache = PlaylistCache()
+        self.on_progress = on_progress or _ignore
+        self.on_log = on_log or _ignore
+        self.on_finished = on_finished or _ignore
+        self.on_playlist_start = on_playlist_start or _ignore
+        self.on_transfer = on_transfer or _ignore
+        self.archive = DownloadArchive()
+        # Videos that failed permanently (private, removed, ...) are skipped next time
+        self.unavailable = DownloadArchive(os.path.join(APP_DATA_DIR, 'unavailable.txt'))
+        self.journal = None  # JobJournal, opened on the worker thread in run()
+        self.transcoder = None  # TranscodePipeline, only for MP3 runs with a capable FFmpeg
+        self.dedup = dedup
+        self.store = None  # ContentStore, opened in run() once the output format is known
+        self.is_running = True
+        self.scheduler = RoundRobinScheduler(self.max_workers)
+        self.ffmpeg = None  # FFmpegInfo, resolved on the worker thread in run()
+        self.downloaders = DownloaderPool(self.build_ydl_opts)
+        self.transfers = TransferMonitor(lambda snapshot: self.on_transfer(snapshot))
+        self.metrics = RunMetrics()
+        self.report_path = report_path  # JSON run report written when the run ends
+        self.metrics_port = metrics_port  # serve Prometheus metrics on localhost (0 = any free port)
+        # Shared by all workers; call bandwidth.set_rate() to change the limit mid-run
+        self.bandwidth = BandwidthLimiter(rate_limit, schedule)
+        self._current = threading.local()  # job being downloaded by this worker
+        self.unresolved_playlists = []
+        self.playlists = []  # PlaylistState of every playlist started, in start order
+        self.states = {}  # playlist name -> PlaylistState, for skipping playlists mid-run
+        self._aborted_videos = set()  # (playlist name, position) skipped by the user
+        self._aborted_playlists = set()
+        self._abort_lock = threading.Lock()
+
+    def resolve_playlist(self, playlist_url):
+        """Start a flat extraction; returns the playlist id, title and a lazy iterator of entries
+
+        The entries are (position, video_id, title, url) records. yt-dlp only
+        fetches the next page of a long playlist or channel when the iterator
+        reaches it, so videos can be queued after the first page.
+        """
+        fallback_name = f"Playlist_{hash(playlist_url)}"
+        try:
+            with self.metrics.phase('playlist_info'):
+                ydl = self.downloaders.get("metadata")
+                # Without process=False yt-dlp walks every page before returning
+                info = ydl.extract_info(playlist_url, download=False, process=False)
+                # A watch URL with a list= parameter first redirects to the playlist
+                while info and info.get('_type') == 'url' and 'entries' not in info:
+                    info = ydl.extract_info(info['url'], download=False, process=False)
+        except Exception as e:
+            self.on_log(f"Error getting playlist info: {str(e)}", fallback_name)
+            return None
+
+        if not info or 'entries' not in info:
+            return None
+
+        # Flat entries already carry the id and url, so no per-video resolution is needed
+        return {
+            'id': info.get('id') or playlist_url,
+            'title': info.get('title') or fallback_name,
+            'entries': iter_playlist_entries(info['entries']),
+            'cached': False,
+        }
+
+    def format_profile(self):
+        """Name the yt-dlp option set used for the selected format"""
+        if self.format_choice == "mp3":
+            # MP3 encoding happens in the TranscodePipeline, so the network stage
+            # only fetches the best audio (kept as-is when FFmpeg can't encode MP3)
+            return "audio"
+        return "mp4"
+
+    def build_ydl_opts(self, profile):
+        """Build yt-dlp options for a profile; the output template is set per video"""
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+        }
+        if profile == "metadata":
+            ydl_opts['extract_flat'] = True
+            return ydl_opts
+
+        # Hooks still fire with noprogress; it only silences console output
+        ydl_opts['noprogress'] = True
+        # Fixed-size reads keep hooks (cancellation, bandwidth limit) frequent
+        # instead of letting yt-dlp grow blocks to several megabytes
+        ydl_opts['buffersize'] = TRANSFER_BLOCK_SIZE
+        ydl_opts['noresizebuffer'] = True
+        ydl_opts['progress_hooks'] = [self.progress_hook]
+        ydl_opts['postprocessor_hooks'] = [self.postprocessor_hook]
+
+        ydl_opts['outtmpl'] = {'default': os.path.join(self.output_path, '%(title)s.%(ext)s')}
+        if profile == "audio":
+            ydl_opts['format'] = 'bestaudio/best'
+        else:  # mp4
+            ydl_opts.update({
+                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+                'merge_output_format': 'mp4',
+            })
+        return ydl_opts
+
+    def progress_hook(self, d):
+        """yt-dlp progress hook, attributed to the job running on this worker"""
+        job = getattr(self._current, 'job', None)
+        if job is not None:
+            received = self.transfers.update(job, job[0], d)
+            if received:
+                self.metrics.add_bytes(received)
+                self.bandwidth.consume(received, should_stop=lambda: self.is_aborted(*job))
+            self.time_transfer(d.get('status'))
+            # Raising here unwinds yt-dlp's download loop, so a cancel lands within one block
+            if self.is_aborted(*job):
+                raise download_aborted("Download cancelled")
+
+    def time_transfer(self, status):
+        """Split a download into resolve (metadata and formats) and transfer phases"""
+        now = time.perf_counter()
+        current = self._current
+        if status == 'downloading' and current.transfer_started is None:
+            if current.resolve_started is not None:
+                self.metrics.observe('resolve', now - current.resolve_started)
+                current.resolve_started = None
+            current.transfer_started = now
+        elif status in ('finished', 'error') and current.transfer_started is not None:
+            self.metrics.observe('transfer', now - current.transfer_started)
+            current.transfer_started = None
+
+    def postprocessor_hook(self, d):
+        """yt-dlp postprocessor hook: journal the video as converting while FFmpeg runs"""
+        job = getattr(self._current, 'job', None)
+        if job is not None and d.get('status') == 'started' and self.is_aborted(*job):
+            raise download_aborted("Download cancelled")
+
+        journal_key = getattr(self._current, 'journal_key', None)
+        if journal_key is not None and d.get('status') == 'started':
+            self.journal.mark(*journal_key, JobJournal.CONVERTING)
+
+        # Postprocessors run one after another on the worker thread
+        if d.get('status') == 'started':
+            self._current.postprocessor_started = time.perf_counter()
+        elif d.get('status') == 'finished' and getattr(self._current, 'postprocessor_started', None) is not None:
+            elapsed = time.perf_counter() - self._current.postprocessor_started
+            self.metrics.observe(f"postprocess:{d.get('postprocessor', 'unknown')}", elapsed)
+            self._current.postprocessor_started = None
+
+    def download_video(self, video_url, index, total, playlist_name):
+        """Download individual video using yt-dlp; returns (info dict, None) or (None, error message)"""
+        job = (playlist_name, index)
+        self._current.job = job
+        self._current.resolve_started = time.perf_counter()
+        self._current.transfer_started = None
+        try:
+            ydl = self.downloaders.get(self.format_profile())
+            # The downloader belongs to this worker thread, so retargeting it is safe
+            ydl.params['outtmpl']['default'] = os.path.join(self.output_path, playlist_name, '%(title)s.%(ext)s')
+
+            info = ydl.extract_info(video_url, download=True)
+            self.on_log(f"✓ Downloaded: {info.get('title', 'Unknown')}", playlist_name)
+            if not info.get('filepath'):
+                downloads = info.get('requested_downloads') or [{}]
+                info['filepath'] = downloads[0].get('filepath') or ydl.prepare_filename(info)
+            return info, None
+
+        except VideoAborted:
+            self.on_log(f"⏭️ Stopped video {index}", playlist_name)
+            return None, None
+        except Exception as e:
+            error_msg = str(e)
+            # Clean up error message by removing ANSI color codes
+            clean_error = re.sub(r'\x1b\[[0-9;]*m', '', error_msg)
+            self.on_log(f"✗ Error downloading video: {clean_error}", playlist_name)
+            return None, clean_error
+        finally:
+            self._current.job = None
+            self.transfers.finish_job(job)
+
+    def prepare_playlist(self, playlist_url):
+        """Resolve a playlist and queue its videos; an error only fails this playlist, not the batch"""
+        if not self.is_running:
+            return
+        try:
+            saved = self.journal.playlist(playlist_url)
+            if saved is not None and saved.get('listed', True):
+                self.restore_playlist(playlist_url, saved)
+            else:
+                self.list_playlist(playlist_url, saved)
+        except Exception as e:
+            # e.g. a title that can't be used as a folder name on this system
+            clean_error = re.sub(r'\x1b\[[0-9;]*m', '', str(e))
+            self.on_log(f"✗ Error preparing playlist {playlist_url}: {clean_error}", "System")
+            self.unresolved_playlists.append(playlist_url)
+            with self._abort_lock:
+                state = next((state for state in self.playlists if state.url == playlist_url), None)
+            if state is not None and not state.listed:
+                self.end_listing(state, complete=False)
+
+    def list_playlist(self, playlist_url, saved):
+        """Enumerate a playlist and queue its videos in batches while it is still being listed"""
+        # The listing was interrupted last time; list again but keep what was finished
+        done_ids = {video['id'] for video in saved['videos'] if video['state'] == JobJournal.DONE} if saved else set()
+
+        playlist, previous = self.load_playlist(playlist_url)
+
+        if not playlist:
+            self.on_log(f"Could not retrieve playlist information: {playlist_url}", "System")
+            self.unresolved_playlists.append(playlist_url)
+            return
+
+        playlist_name = playlist['title']
+
+        # Create playlist-specific directory
+        playlist_output_path = os.path.join(self.output_path, playlist_name)
+        os.makedirs(playlist_output_path, exist_ok=True)
+
+        synced_ids = set(previous['synced_ids']) if self.sync and previous is not None else set()
+        state = self.add_state(PlaylistState(playlist_url, playlist_name, playlist['id']))
+        self.journal.set_playlist(playlist_url, playlist['id'], playlist_name)
+
+        # Skip synced, archived and unavailable videos before any per-video extraction happens
+        records = []  # every listed video, for the playlist cache
+        batch = []
+        archived = unavailable = 0
+        complete = True
+        started = time.perf_counter()
+        try:
+            for record in playlist['entries']:
+                if self.is_aborted(playlist_name, None):
+                    complete = False
+                    break
+                records.append(record)
+                position, video_id, _, video_url = record
+                if video_id in synced_ids or video_id in done_ids:
+                    archived += 1
+                    continue
+                if self.use_archive:
+                    key = self.archive_key(playlist['id'], video_id)
+                    if key in self.archive:
+                        archived += 1
+                        continue
+                    if key in self.unavailable:
+                        unavailable += 1
+                        continue
+                batch.append((position, video_id, video_url))
+                if len(batch) >= LISTING_BATCH:
+                    self.queue_videos(state, batch)
+                    batch = []
+        except Exception as e:
+            # Later pages can fail (network, rate limiting) after downloads have started
+            clean_error = re.sub(r'\x1b\[[0-9;]*m', '', str(e))
+            self.on_log(f"✗ Error listing playlist: {clean_error}", playlist_name)
+            self.unresolved_playlists.append(playlist_url)
+            complete = False
+        self.queue_videos(state, batch)
+        self.metrics.observe('playlist_listing', time.perf_counter() - started)
+
+        if complete and not records:
+            self.on_log("No videos found in the playlist.", playlist_name)
+        if unavailable:
+            self.on_log(f"Skipping {unavailable} videos that were unavailable in earlier runs", playlist_name)
+        if archived:
+            if synced_ids:
+                reason = "synced or archived"
+            elif done_ids:
+                reason = "finished in the previous session or archived"
+            else:
+                reason = "already in the download archive"
+            self.on_log(f"Skipping {archived} videos {reason}", playlist_name)
+        state.archived = archived + unavailable
+
+        # A partial listing is neither cached nor used to detect removed videos
+        if complete:
+            if not playlist['cached']:
+                self.playlist_cache.save(playlist_url, {'id': playlist['id'], 'title': playlist_name, 'entries': records},
+                                         previous['synced_ids'] if previous else [])
+            if self.sync and previous is not None:
+                listed_ids = {record[1] for record in records}
+                removed = [entry for entry in previous['entries'] if entry['id'] not in listed_ids]
+                added = len(listed_ids - synced_ids)
+                self.on_log(f"Sync: {added} new, {len(removed)} removed since the last sync", playlist_name)
+                if removed and self.prune:
+                    self.prune_removed(playlist_name, playlist['id'], removed)
+            self.journal.finish_listing(playlist_url, archived)
+        self.end_listing(state, complete)
+
+    def add_state(self, state):
+        """Register a playlist for the summary and for skipping it by name"""
+        with self._abort_lock:
+            self.playlists.append(state)
+            self.states[state.name] = state
+        return state
+
+    def queue_videos(self, state, entries):
+        """Hand newly listed videos to the download workers and report the playlist's new total"""
+        if not entries:
+            return
+        self.journal.add_videos(state.url, entries)
+        self.scheduler.add_jobs(state, state.add_entries(entries))
+        self.on_playlist_start(state.name, state.total)
+
+    def end_listing(self, state, complete=True):
+        """Mark a playlist as fully listed, finishing it if no video is still pending"""
+        if state.total:
+            self.on_log(f"Found {state.total} videos in the playlist", state.name)
+        if not state.finish_listing(complete):
+            return
+        if state.total:
+            self.finish_playlist(state)
+        elif state.archived:
+            self.on_log("All videos already downloaded.", state.name)
+            self.playlist_synced(state)
+
+    def load_playlist(self, playlist_url):
+        """Return (listing, previous cached snapshot), reusing the cache while it is fresh"""
+        previous = self.playlist_cache.load(playlist_url)
+        if previous is not None and self.metadata_ttl and time.time() - previous['fetched'] < self.metadata_ttl:
+            age = int(time.time() - previous['fetched'])
+            self.on_log(f"Using cached playlist listing ({age}s old)", previous['title'])
+            entries = ((entry['position'], entry['id'], entry['title'], entry['url']) for entry in previous['entries'])
+            return {'id': previous['id'], 'title': previous['title'], 'entries': entries, 'cached': True}, previous
+
+        # Resolve title and entries in one flat extraction
+        self.on_log(f"Getting playlist information: {playlist_url}", "System")
+        return self.resolve_playlist(playlist_url), previous
+
+    def prune_removed(self, playlist_name, playlist_id, removed):
+        """Delete the files of videos that are no longer in the playlist"""
+        playlist_output_path = os.path.join(self.output_path, playlist_name)
+        # Files are saved as %(title)s.%(ext)s, with the title sanitized by yt-dlp
+        stems = {yt_dlp.utils.sanitize_filename(entry['title']): entry for entry in removed if entry['title']}
+        for filename in os.listdir(playlist_output_path):
+            if os.path.splitext(filename)[0] in stems:
+                os.remove(os.path.join(playlist_output_path, filename))
+                self.on_log(f"🗑️ Removed: {filename}", playlist_name)
+        if self.use_archive:
+            self.archive.remove(self.archive_key(playlist_id, entry['id']) for entry in removed)
+
+    def playlist_synced(self, state):
+        """Remember which videos this run handled so the next sync only fetches what's new"""
+        if self.sync and not state.partial:
+            # Failed and skipped videos stay unsynced so the next sync tries them again
+            unfinished = [entry[1] for entry, result in zip(state.entries, state.results) if not result]
+            self.playlist_cache.mark_synced(state.url, unfinished)
+
+    def restore_playlist(self, playlist_url, saved):
+        """Queue a playlist from the journal instead of enumerating it again"""
+        playlist_name = saved['title']
+        os.makedirs(os.path.join(self.output_path, playlist_name), exist_ok=True)
+
+        # Anything not done, including videos interrupted mid-download, is retried,
+        # except videos that have since turned out to be unavailable
+        entries = []
+        unavailable = 0
+        for video in saved['videos']:
+            if video['state'] == JobJournal.DONE:
+                continue
+            if self.use_archive and self.archive_key(saved['id'], video['id']) in self.unavailable:
+                unavailable += 1
+                continue
+            entries.append((video['position'], video['id'], video['url']))
+        done = len(saved['videos']) - len(entries) - unavailable
+        if unavailable:
+            self.on_log(f"Skipping {unavailable} videos that were unavailable in earlier runs", playlist_name)
+        if entries:
+            self.on_log(f"Resuming from previous session: {len(entries)} videos left", playlist_name)
+        state = self.add_state(PlaylistState(playlist_url, playlist_name, saved['id'],
+                                             saved['archived'] + done + unavailable))
+        self.queue_videos(state, entries)
+        self.end_listing(state)
+
+    def archive_key(self, playlist_id, video_id):
+        return DownloadArchive.make_key(self.format_choice, self.output_path, playlist_id, video_id)
+
+    def download_worker(self):
+        """Pull jobs from the shared scheduler until it is exhausted or cancelled"""
+        while True:
+            job = self.scheduler.next_job()
+            if job is None:
+                return
+            try:
+                if self.is_running:
+                    self.process_job(*job)
+            finally:
+                self.scheduler.task_done()
+
+    def process_job(self, state, slot):
+        """Download one scheduled video and pass it on, retry it or record its result"""
+        position, video_id, video_url = state.entries[slot]
+        if self.is_aborted(state.name, position):
+            self.complete_video(state, slot, None)
+            return
+        # End-to-end latency counts from the first attempt
+        if state.started[slot] is None:
+            state.started[slot] = time.perf_counter()
+        if self.store is not None:
+            entry = self.store.claim(video_id)
+            if entry is not None:
+                # Already downloaded for another playlist
+                try:
+                    self.store.link(entry, os.path.join(self.output_path, state.name))
+                except OSError as e:
+                    self.on_log(f"⚠️ Could not link from shared store, downloading instead: {e}", state.name)
+                else:
+                    self.on_log(f"🔗 Linked from shared store: {entry['filename']}", state.name)
+                    self.metrics.count_video('linked')
+                    self.complete_video(state, slot, True)
+                    return
+            else:
+                state.claims.add(slot)
+            if not self.is_running:
+                self.release_claim(state, slot)
+                return
+
+        self.journal.mark(state.url, position, JobJournal.DOWNLOADING)
+        self._current.journal_key = (state.url, position)
+        try:
+            info, error = self.download_video(video_url, position, state.total, state.name)
+        finally:
+            self._current.journal_key = None
+
+        if info is None:
+            self.release_claim(state, slot)
+            if self.is_aborted(state.name, position):
+                self.complete_video(state, slot, None)
+                return
+            if self.retry_video(state, slot, error):
+                return
+        else:
+            limit = self.scheduler.relax()
+            if limit is not None:
+                self.on_log(f"Raising parallel downloads back to {limit}", "System")
+
+        if info and self.transcoder is not None:
+            # Hand the file to the encoders and go straight back to downloading
+            self.journal.mark(state.url, position, JobJournal.CONVERTING)
+            self.transcoder.submit((state, slot), info['filepath'])
+            return
+        self.complete_video(state, slot, bool(info), info['filepath'] if info else None)
+
+    def release_claim(self, state, slot):
+        """Give up the video's ContentStore claim, but only if this slot's job took it"""
+        if self.store is not None and state.drop_claim(slot):
+            self.store.release(state.entries[slot][1])
+
+    def retry_video(self, state, slot, error):
+        """Re-queue a video after a transient failure; returns False when it has failed for good"""
+        position, video_id, _ = state.entries[slot]
+        kind = classify_error(error)
+        if kind == PERMANENT:
+            if self.use_archive:
+                self.unavailable.add(self.archive_key(state.playlist_id, video_id))
+            self.on_log("⛔ Video is unavailable and will be skipped in future runs", state.name)
+            return False
+
+        if kind == RATE_LIMITED:
+            limit = self.scheduler.throttle()
+            if limit is not None:
+                self.on_log(f"⚠️ Rate limited, reducing parallel downloads to {limit}", "System")
+
+        state.attempts[slot] += 1
+        attempt = state.attempts[slot]
+        if attempt > MAX_RETRIES or not self.is_running:
+            return False
+        delay = retry_delay(attempt, kind == RATE_LIMITED)
+        self.journal.mark(state.url, position, JobJournal.PENDING)
+        self.on_log(f"↻ Retrying video {position} in {delay:.0f}s (attempt {attempt}/{MAX_RETRIES})", state.name)
+        self.metrics.count_video('retried')
+        self.scheduler.retry(state, slot, delay)
+        return True
+
+    def transcode_done(self, item, mp3_path, error):
+        """TranscodePipeline callback for a finished (or failed) MP3 encode"""
+        state, slot = item
+        if isinstance(error, VideoAborted):
+            self.complete_video(state, slot, None)
+            return
+        if error is not None:
+            self.on_log(f"✗ Error converting to MP3: {error}", state.name)
+        self.complete_video(state, slot, error is None, mp3_path)
+
+    def complete_video(self, state, slot, success, filepath=None):
+        """Record a video's final result; called from download and transcode workers
+
+        success is None for a video that was skipped or stopped; its journal
+        entry is left alone so a resumed run picks it up again.
+        """
+        position, video_id, _ = state.entries[slot]
+        if self.store is not None:
+            if success and filepath:
+                # add() settles the claim itself
+                state.drop_claim(slot)
+                try:
+                    self.store.add(video_id, filepath)
+                except OSError as e:
+                    self.on_log(f"⚠️ Could not add to shared store: {e}", state.name)
+            else:
+                self.release_claim(state, slot)
+        if success and self.use_archive:
+            self.archive.add(self.archive_key(state.playlist_id, video_id))
+        if success is not None:
+            self.journal.mark(state.url, position, JobJournal.DONE if success else JobJournal.FAILED)
+            self.journal.checkpoint()
+        completed, finished = state.record(slot, success)
+        if success is None:
+            self.metrics.count_video('skipped')
+        else:
+            if state.started[slot] is not None:
+                self.metrics.observe('video', time.perf_counter() - state.started[slot])
+            self.metrics.count_video('downloaded' if success else 'failed')
+
+        # Progress counts finished videos, whichever worker finished them
+        progress = int(completed / state.total * 100)
+        self.on_progress(completed, state.total, progress, state.name)
+
+        if finished:
+            self.finish_playlist(state)
+
+    def finish_playlist(self, state):
+        """Close out a playlist once it is fully listed and every video has a result"""
+        self.journal.finish_playlist(state.url)
+        self.playlist_synced(state)
+        self.report_playlist(state)
+
+    def report_playlist(self, state):
+        """Log the per-playlist summary once every video has been attempted"""
+        failed = [str(entry[0]) for entry, result in zip(state.entries, state.results) if result is False]
+        if failed:
+            self.on_log(f"Failed videos (playlist positions): {', '.join(failed)}", state.name)
+        message = f"Playlist completed: {state.successful}/{state.total} videos downloaded"
+        if state.skipped:
+            message += f", {state.skipped} skipped"
+        if state.partial:
+            message += " (listing incomplete)"
+        self.on_log(message, state.name)
+
+    def summarize(self, playlists):
+        """Video and playlist counts for the run summary"""
+        return {
+            'total': sum(state.total for state in playlists),
+            'successful': sum(state.successful for state in playlists),
+            'failed': sum(state.results.count(False) for state in playlists),
+            'skipped': sum(state.skipped for state in playlists),
+            'archived': sum(state.archived for state in playlists),
+            'unresolved': len(self.unresolved_playlists),
+            'deduplicated': self.store.linked if self.store is not None else 0,
+            'saved_bytes': self.store.saved_bytes if self.store is not None else 0,
+        }
+
+    def run(self):
+        """Download every playlist and return a summary dict
+
+        The summary has success, message, cancelled, total, successful, failed,
+        skipped, archived, unresolved (playlists that could not be resolved), deduplicated
+        (videos linked from the shared store) and saved_bytes.
+        """
+        summary = {'success': False, 'message': '', 'cancelled': False}
+        metrics_server = None
+        self.metrics.start_sampling(self.sample_gauges)
+        try:
+            if self.metrics_port is not None:
+                metrics_server = MetricsServer(self.metrics, self.metrics_port)
+                try:
+                    self.on_log(f"📈 Serving metrics at {metrics_server.start()}", "System")
+                except OSError as e:
+                    self.on_log(f"⚠️ Could not start the metrics endpoint: {e}", "System")
+                    metrics_server = None
+
+            # Check for FFmpeg if MP3 is selected
+            self.ffmpeg = FFmpegService.get()
+            if self.format_choice == "mp3":
+                if self.ffmpeg.supports_mp3:
+                    self.on_log(f"✅ Using FFmpeg at: {self.ffmpeg.path}", "System")
+                elif self.ffmpeg.available:
+                    self.on_log("⚠️ FFmpeg was built without an MP3 encoder. Audio files will be downloaded in original format.", "System")
+                else:
+                    self.on_log("⚠️ FFmpeg not found. Audio files will be downloaded in original format.", "System")
+                    self.on_log("You can convert them to MP3 later using other tools.", "System")
+            
+            # Create main output directory if it doesn't exist
+            if not os.path.exists(self.output_path):
+                os.makedirs(self.output_path)
+
+            if self.use_archive:
+                self.archive.load()
+                self.unavailable.load()
+                self.on_log(f"Loaded download archive ({len(self.archive)} videos)", "System")
+
+            rate = self.bandwidth.current_rate()
+            if rate or self.bandwidth.schedule is not None:
+                limit = f"{format_bytes(rate)}/s" if rate else "unlimited"
+                scheduled = " (scheduled)" if self.bandwidth.schedule is not None else ""
+                self.on_log(f"🚦 Bandwidth limit: {limit}{scheduled}", "System")
+
+            self.journal = JobJournal.open(self.playlist_urls, self.format_choice, self.output_path,
+                                           resume=self.resume)
+            if self.journal.is_resumed:
+                done, total = self.journal.progress()
+                self.on_log(f"Resuming previous session: {done}/{total} videos already done", "System")
+
+            if self.format_choice == "mp3" and self.ffmpeg.supports_mp3:
+                self.transcoder = TranscodePipeline(self.ffmpeg.path, self.transcode_done, metrics=self.metrics,
+                                                    should_abort=lambda item: self.is_aborted(item[0].name, item[0].entries[item[1]][0]))
+                self.transcoder.start()
+                self.on_log(f"Encoding MP3 on {self.transcoder.workers} FFmpeg workers", "System")
+
+            if self.dedup:
+                profile = "mp3" if self.transcoder is not None else self.format_profile()
+                self.store = ContentStore(os.path.join(self.output_path, '.store', profile)).load()
+
+            # One pool of download workers is shared by every playlist; playlists are
+            # listed concurrently and their videos join the round-robin batch by batch,
+            # so downloads start while long listings are still being paged through
+            with ThreadPoolExecutor(max_workers=self.max_workers) as download_pool:
+                workers = [download_pool.submit(self.download_worker) for _ in range(self.max_workers)]
+
+                resolve_workers = max(1, min(RESOLVE_WORKERS, len(self.playlist_urls)))
+                try:
+                    with ThreadPoolExecutor(max_workers=resolve_workers) as resolve_pool:
+                        pending = [resolve_pool.submit(self.prepare_playlist, url) for url in self.playlist_urls]
+                        for future in as_completed(pending):
+                            future.result()
+                except BaseException:
+                    # Release the workers waiting for jobs, or leaving the pool would block forever
+                    self.scheduler.cancel()
+                    raise
+
+                self.scheduler.close()
+                for worker in workers:
+                    worker.result()
+
+            if self.transcoder is not None:
+                self.transcoder.close()
+
+            # Throttling may have swallowed the last update; publish the final state
+            self.on_transfer(self.transfers.snapshot())
+
+            summary.update(self.summarize(self.playlists))
+            if self.is_running and not summary['failed'] and not summary['unresolved']:
+                # Nothing left to resume
+                self.journal.discard()
+
+            if self.is_running:
+                message = f"All downloads completed! {summary['successful']}/{summary['total']} videos downloaded successfully across {len(self.playlist_urls)} playlists."
+                if summary['archived']:
+                    message += f" {summary['archived']} videos were skipped as already downloaded."
+                if summary['deduplicated']:
+                    message += (f" {summary['deduplicated']} duplicates were linked instead of downloaded,"
+                                f" saving {format_bytes(summary['saved_bytes'])}.")
+                summary.update(success=True, message=message)
+            else:
+                summary.update(message="Download cancelled by user.", cancelled=True)
+            
+        except Exception as e:
+            self.scheduler.cancel()
+            summary.update(self.summarize(self.playlists))
+            summary.update(success=False, message=f"Error: {str(e)}")
+        finally:
+            self.downloaders.close()
+            if self.journal is not None:
+                self.journal.checkpoint(force=True)
+            self.metrics.stop()
+            if metrics_server is not None:
+                metrics_server.stop()
+
+        if self.report_path:
+            try:
+                self.metrics.write_report(self.report_path, summary)
+                self.on_log(f"📊 Run report written to {os.path.abspath(self.report_path)}", "System")
+            except OSError as e:
+                self.on_log(f"⚠️ Could not write the run report: {e}", "System")
+
+        self.on_finished(summary['success'], summary['message'], "System")
+        return summary
+    
+    def sample_gauges(self):
+        """Queue depths and live speed for the metrics sampler"""
+        gauges = self.scheduler.depths()
+        gauges['transcode'] = self.transcoder.pending() if self.transcoder is not None else 0
+        gauges['speed'] = self.transfers.snapshot()['speed']
+        return gauges
+
+    def is_aborted(self, playlist_name, position):
+        """Whether a video should stop: the run was stopped, or the video or its playlist was skipped"""
+        return (not self.is_running or playlist_name in self._aborted_playlists
+                or (playlist_name, position) in self._aborted_videos)
+
+    def abort_video(self, playlist_name, position):
+        """Skip one video, stopping its download or MP3 conversion if it is running"""
+        with self._abort_lock:
+            self._aborted_videos.add((playlist_name, position))
+        self.on_log(f"⏭️ Skipping video {position}", playlist_name)
+
+    def abort_playlist(self, playlist_name):
+        """Skip the rest of a playlist; its running downloads stop and queued ones are dropped"""
+        with self._abort_lock:
+            self._aborted_playlists.add(playlist_name)
+        self.on_log("⏭️ Skipping the rest of this playlist", playlist_name)
+        state = self.states.get(playlist_name)
+        if state is not None:
+            for slot in self.scheduler.remove_playlist(state):
+                self.complete_video(state, slot, None)
+
+    def stop(self):
+        """Stop the run without blocking; running downloads and encodes are interrupted"""
+        self.is_running = False
+        # Drop queued videos; in-flight ones stop at their next progress update
+        self.scheduler.cancel()
+        if self.store is not None:
+            self.store.cancel()
+        if self.transcoder is not None:
+            self.transcoder.cancel()
+
+
+def normalize_playlist_url(url):
+    """Return (playlist_id, canonical URL) for a URL with a list= parameter
+
+    Watch URLs, youtu.be links and the music and mobile sites all name a
+    playlist the same way, so they map to one https://www.youtube.com/playlist URL.
+    """
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(url.strip()).query)
+    playlist_id = (query.get('list') or [''])[0].strip()
+    if not playlist_id:
+        raise ValueError(f"not a playlist URL: {url}")
+    return playlist_id, f"https://www.youtube.com/playlist?list={playlist_id}"
+
+
+def make_job(url, format_choice='mp4', output_path='.', priority=0, base_dir=None):
+    """Validate one queue job; a relative output folder is taken relative to base_dir"""
+    playlist_id, url = normalize_playlist_url(str(url))
+    if format_choice not in ('mp4', 'mp3'):
+        raise ValueError(f"unknown format {format_choice!r} (expected mp4 or mp3)")
+    try:
+        priority = int(priority)
+    except (TypeError, ValueError):
+        raise ValueError(f"priority must be a whole number, not {priority!r}")
+    output_path = os.path.expanduser(str(output_path))
+    if base_dir:
+        output_path = os.path.join(base_dir, output_path)
+    return {'url': url, 'playlist_id': playlist_id, 'format': format_choice,
+            'output': os.path.abspath(output_path), 'priority': priority}
+
+
+def load_job_file(path, format_choice='mp4', output_path='.', priority=0):
+    """Read queue jobs from a JSON, YAML or CSV job file; other files hold one URL per line
+
+    JSON and YAML files contain a list of jobs, or a mapping with a 'jobs'
+    list and optional 'defaults'. A job is a URL or a mapping with url and
+    optionally format, output and priority; CSV files have those columns.
+    Missing fields fall back to the defaults and then to the arguments.
+    Raises ValueError naming the first invalid job.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, encoding='utf-8', newline='') as f:
+        if extension == '.json':
+            data = json.load(f)
+        elif extension in ('.yaml', '.yml'):
+            import yaml  # only needed for YAML job files
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"{path}: {e}")
+        elif extension == '.csv':
+            data = [{key.strip(): (value or '').strip() for key, value in row.items() if key}
+                    for row in csv.DictReader(f)]
+        else:
+            data = [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    defaults = {'format': format_choice, 'output': output_path, 'priority': priority}
+    if isinstance(data, dict):
+        if not isinstance(data.get('defaults') or {}, dict):
+            raise ValueError(f"{path}: 'defaults' must be a mapping")
+        defaults.update({key: value for key, value in (data.get('defaults') or {}).items() if value not in (None, '')})
+        data = data.get('jobs')
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: expected a list of jobs")
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for number, item in enumerate(data, 1):
+        if isinstance(item, str):
+            item = {'url': item}
+        if not isinstance(item, dict):
+            raise ValueError(f"{path}: job {number}: expected a URL or a mapping")
+        fields = dict(defaults, **{key: value for key, value in item.items() if value not in (None, '')})
+        if not fields.get('url'):
+            raise ValueError(f"{path}: job {number}: missing url")
+        try:
+            jobs.append(make_job(fields['url'], fields['format'], fields['output'], fields['priority'], base_dir))
+        except ValueError as e:
+            raise ValueError(f"{path}: job {number}: {e}")
+    return jobs
+
+
+class JobQueue:
+    """Persistent queue of playlist jobs, each with its own format, output folder and priority
+
+    A job is identified by its playlist ID, format and output folder, so
+    adding a playlist again, in any URL form, updates the queued job instead
+    of duplicating it. Higher priorities run first, equal ones in the order
+    they were added. Every change re-reads the file under a lock shared with
+    other processes, so jobs added from another process while a run is in
+    progress are picked up and never lost. Claimed jobs record their runner,
+    which holds a lock on its own owner file while it lives, so only jobs of
+    runners that died are put back in the queue.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    path = os.path.join(APP_DATA_DIR, 'queue.json')
+
+    def __init__(self, path=None):
+        if path is not None:
+            self.path = path
+        self.jobs = []
+        self.owner = None  # ID of this queue's runner once it claims jobs
+        self._owner_file = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def job_key(job):
+        return f"{job['playlist_id']}|{job['format']}|{job['output']}"
+
+    def _read(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)['jobs']
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+    def _write(self):
+        write_json_atomic(self.path, {'version': 1, 'jobs': self.jobs})
+
+    def _owner_path(self, owner):
+        return os.path.join(os.path.dirname(self.path), 'runners', owner + '.lock')
+
+    def _claim_owner(self):
+        """Start holding this runner's owner lock; called with the queue locked"""
+        if self.owner is not None:
+            return
+        owner = f"{os.getpid()}-{random.getrandbits(32):08x}"
+        path = self._owner_path(owner)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._owner_file = open(path, 'a+b')
+        lock_file(self._owner_file)
+        self.owner = owner
+
+    def release_owner(self):
+        """Stop holding the owner lock once this runner has finished every job it claimed"""
+        with self._lock:
+            if self._owner_file is None:
+                return
+            unlock_file(self._owner_file)
+            self._owner_file.close()
+            with contextlib.suppress(OSError):
+                os.remove(self._owner_path(self.owner))
+            self._owner_file = None
+            self.owner = None
+
+    def _owner_alive(self, owner):
+        """Whether another runner that claimed jobs still holds its owner lock"""
+        if owner is None:
+            return False
+        if owner == self.owner:
+            # Our own claims are only stale when this runner isn't running a batch
+            return False
+        path = self._owner_path(owner)
+        try:
+            f = open(path, 'r+b')
+        except OSError:
+            return False
+        with f:
+            alive = not lock_file(f, blocking=False)
+            if not alive:
+                unlock_file(f)
+        if not alive:
+            with contextlib.suppress(OSError):
+                os.remove(path)
+        return alive
+
+    @contextlib.contextmanager
+    def _update(self):
+        """Lock the queue against other threads and processes and load it for a read-modify-write"""
+        with self._lock, file_lock(self.path):
+            self.jobs = self._read()
+            yield
+
+    def load(self):
+        with self._lock:
+            self.jobs = self._read()
+        return self
+
+    def add(self, jobs):
+        """Queue jobs from make_job()/load_job_file(); returns (added, updated) counts
+
+        A duplicate keeps the higher priority and is queued again if it had
+        already finished.
+        """
+        added = updated = 0
+        with self._update():
+            existing = {self.job_key(job): job for job in self.jobs}
+            for job in jobs:
+                key = self.job_key(job)
+                queued = existing.get(key)
+                if queued is None:
+                    queued = existing[key] = dict(job, status=self.PENDING, added=time.time(), updated=time.time())
+                    self.jobs.append(queued)
+                    added += 1
+                    continue
+                queued['priority'] = max(queued['priority'], job['priority'])
+                if queued['status'] in (self.DONE, self.FAILED):
+                    queued.update(status=self.PENDING, updated=time.time())
+                updated += 1
+            self._write()
+        return added, updated
+
+    def next_batch(self, limit=QUEUE_BATCH_SIZE):
+        """Claim the highest-priority pending jobs that share a format and output folder"""
+        with self._update():
+            pending = sorted((job for job in self.jobs if job['status'] == self.PENDING),
+                             key=lambda job: -job['priority'])
+            if not pending:
+                return []
+            group = (pending[0]['priority'], pending[0]['format'], pending[0]['output'])
+            batch = [job for job in pending if (job['priority'], job['format'], job['output']) == group][:limit]
+            self._claim_owner()
+            for job in batch:
+                job.update(status=self.RUNNING, owner=self.owner, updated=time.time())
+            self._write()
+            return [dict(job) for job in batch]
+
+    def finish(self, statuses):
+        """Store the outcome of claimed jobs, given as {job key: status}"""
+        with self._update():
+            for job in self.jobs:
+                status = statuses.get(self.job_key(job))
+                if status is not None:
+                    job.update(status=status, updated=time.time())
+            self._write()
+
+    def remove(self, jobs):
+        """Drop the unfinished ones of these jobs, e.g. of an abandoned batch; returns how many"""
+        keys = {self.job_key(job) for job in jobs}
+        with self._update():
+            kept = [job for job in self.jobs
+                    if self.job_key(job) not in keys or job['status'] in (self.DONE, self.FAILED)]
+            removed = len(self.jobs) - len(kept)
+            if removed:
+                self.jobs = kept
+                self._write()
+            return removed
+
+    def requeue_running(self):
+        """Put jobs claimed by a runner that died back in the queue; returns how many"""
+        with self._update():
+            running = [job for job in self.jobs
+                       if job['status'] == self.RUNNING and not self._owner_alive(job.get('owner'))]
+            for job in running:
+                job['status'] = self.PENDING
+            if running:
+                self._write()
+            return len(running)
+
+    def counts(self):
+        """Number of jobs per status"""
+        with self._lock:
+            self.jobs = self._read()
+            counts = dict.fromkeys((self.PENDING, self.RUNNING, self.DONE, self.FAILED), 0)
+            for job in self.jobs:
+                counts[job['status']] += 1
+            return counts
+
+
+class QueueRunner:
+    """Runs a JobQueue batch by batch until no pending job is left
+
+    Every batch is one DownloadEngine run over jobs sharing a format and
+    output folder, so jobs added while a batch runs start with a later one.
+    engine_options are passed to each DownloadEngine; on_finished is called
+    once, for the whole queue. The bandwidth limiter is shared by all batches.
+    A report_path gets the first batch's run report; later batches write
+    theirs next to it with the batch number appended (run-2.json, ...).
+    """
+    SUMMARY_COUNTS = ('total', 'successful', 'failed', 'skipped', 'archived', 'unresolved',
+                      'deduplicated', 'saved_bytes')
+
+    def __init__(self, queue, batch_size=QUEUE_BATCH_SIZE, rate_limit=0, schedule=None, **engine_options):
+        self.queue = queue
+        self.batch_size = batch_size
+        self.on_log = engine_options.get('on_log') or _ignore
+        self.on_finished = engine_options.pop('on_finished', None) or _ignore
+        self.report_path = engine_options.pop('report_path', None)
+        self.engine_options = engine_options
+        self.bandwidth = BandwidthLimiter(rate_limit, schedule)
+        self.engine = None  # DownloadEngine of the batch running now
+        self.is_running = True
+
+    def run(self):
+        """Run every pending job and return a summary dict like DownloadEngine.run()"""
+        summary = dict.fromkeys(self.SUMMARY_COUNTS, 0)
+        summary.update(success=True, message='', cancelled=False, jobs_done=0, jobs_failed=0)
+        errors = []
+        requeued = self.queue.requeue_running()
+        if requeued:
+            self.on_log(f"📋 Re-queued {requeued} jobs from an interrupted run", "System")
+
+        batch = 0
+        while self.is_running:
+            jobs = self.queue.next_batch(self.batch_size)
+            if not jobs:
+                break
+            batch += 1
+            first = jobs[0]
+            left = self.queue.counts()[JobQueue.PENDING]
+            self.on_log(f"📋 Starting {len(jobs)} queued playlists ({first['format']} to {first['output']}, "
+                        f"priority {first['priority']}); {left} jobs still queued", "System")
+            engine = DownloadEngine([job['url'] for job in jobs], first['format'], first['output'],
+                                    report_path=self.batch_report_path(batch), **self.engine_options)
+            engine.bandwidth = self.bandwidth
+            self.engine = engine
+            if not self.is_running:
+                engine.stop()
+            result = engine.run()
+
+            statuses = {JobQueue.job_key(job): self.job_status(engine, job['url']) for job in jobs}
+            self.queue.finish(statuses)
+            if engine.journal is not None:
+                # Done jobs, skipped playlists included, leave nothing to resume
+                engine.journal.drop_playlists([job['url'] for job in jobs
+                                               if statuses[JobQueue.job_key(job)] == JobQueue.DONE])
+            summary['jobs_done'] += list(statuses.values()).count(JobQueue.DONE)
+            summary['jobs_failed'] += list(statuses.values()).count(JobQueue.FAILED)
+            for key in self.SUMMARY_COUNTS:
+                summary[key] += result.get(key, 0)
+            if result['cancelled']:
+                summary['cancelled'] = True
+            elif not result['success']:
+                errors.append(result['message'])
+
+        # Every claimed job has its outcome now; other runners may take over the queue
+        self.queue.release_owner()
+
+        if summary['cancelled'] or not self.is_running:
+            summary.update(success=False, cancelled=True, message="Download cancelled by user.")
+        else:
+            message = (f"Queue finished: {summary['jobs_done']} jobs done, {summary['jobs_failed']} failed; "
+                       f"{summary['successful']}/{summary['total']} videos downloaded successfully.")
+            if summary['archived']:
+                message += f" {summary['archived']} videos were skipped as already downloaded."
+            if summary['deduplicated']:
+                message += (f" {summary['deduplicated']} duplicates were linked instead of downloaded,"
+                            f" saving {format_bytes(summary['saved_bytes'])}.")
+            if errors:
+                message += f" {len(errors)} batches stopped with an error: {errors[-1]}"
+            summary.update(success=not errors, message=message)
+        self.on_finished(summary['success'], summary['message'], "System")
+        return summary
+
+    def batch_report_path(self, batch):
+        """Run report file of a batch, so later batches don't overwrite earlier reports"""
+        if not self.report_path or batch == 1:
+            return self.report_path
+        root, ext = os.path.splitext(self.report_path)
+        return f"{root}-{batch}{ext}"
+
+    @staticmethod
+    def job_status(engine, url):
+        """Queue status of one job after its batch ran"""
+        if url in engine.unresolved_playlists:
+            return JobQueue.FAILED
+        state = next((state for state in engine.playlists if state.url == url), None)
+        if state is None or not state.listed or state.completed < state.total:
+            # Interrupted before it finished: run it again next time
+            return JobQueue.PENDING if not engine.is_running else JobQueue.FAILED
+        return JobQueue.FAILED if False in state.results else JobQueue.DONE
+
+    def abort_video(self, playlist_name, position):
+        if self.engine is not None:
+            self.engine.abort_video(playlist_name, position)
+
+    def abort_playlist(self, playlist_name):
+        if self.engine is not None:
+            self.engine.abort_playlist(playlist_name)
+
+    def stop(self):
+        """Stop the running batch and don't start another"""
+        self.is_running = False
+        if self.engine is not None:
+            self.engine.stop()
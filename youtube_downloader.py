@@ -1,223 +1,51 @@
 import sys
 import os
-import re
-import json
-import subprocess
-import shutil
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+import time
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QAbstractListModel, QModelIndex, QSize
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QHBoxLayout, QLabel, QLineEdit, QPushButton,
-                             QComboBox, QProgressBar, QTextEdit, QMessageBox,
-                             QFileDialog, QScrollArea, QFrame, QGridLayout)
+                             QComboBox, QTextEdit, QPlainTextEdit, QMessageBox,
+                             QFileDialog, QScrollArea, QFrame, QGridLayout,
+                             QSpinBox, QDoubleSpinBox, QCheckBox, QInputDialog,
+                             QListView, QStyle, QStyledItemDelegate, QStyleOptionProgressBar)
 
-import yt_dlp
-import urllib.request
-import glob
+from downloader_engine import (FFmpegService, JobJournal, JobQueue, QueueRunner, LogSink, BandwidthSchedule,
+                               ProgressBoard, APP_DATA_DIR, DEFAULT_MAX_WORKERS,
+                               LOG_FLUSH_INTERVAL_MS, LOG_MAX_LINES, PROGRESS_FRAME_MS, format_bytes, format_eta,
+                               load_job_file, make_job, yt_dlp)
 
 class DownloadThread(QThread):
-    progress_signal = pyqtSignal(int, int, int, str)  # current, total, percentage, playlist_name
+    """Runs the job queue off the GUI thread; progress goes straight into a ProgressBoard"""
     log_signal = pyqtSignal(str, str)  # message, playlist_name
     finished_signal = pyqtSignal(bool, str, str)  # success, message, playlist_name
-    playlist_start_signal = pyqtSignal(str, int)  # playlist_name, total_videos
 
-    def __init__(self, playlist_urls, format_choice, output_path):
+    def __init__(self, job_queue, progress_board, max_workers=DEFAULT_MAX_WORKERS,
+                 use_archive=True, metadata_ttl=0, sync=False, prune=False, rate_limit=0, schedule=None,
+                 dedup=True, report_path=None):
         super().__init__()
-        self.playlist_urls = playlist_urls
-        self.format_choice = format_choice
-        self.output_path = output_path
-        self.is_running = True
-        self.ffmpeg_path = self.find_ffmpeg()
-
-    def find_ffmpeg(self):
-        """Find FFmpeg executable path"""
-        # Check if ffmpeg is in PATH
-        ffmpeg_path = shutil.which('ffmpeg')
-        if ffmpeg_path:
-            return ffmpeg_path
-            
-        # Check common installation paths for winget installation
-        possible_paths = [
-            os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'WinGet', 'Packages', 'Gyan.FFmpeg.Essentials_*', 'bin', 'ffmpeg.exe'),
-            os.path.join(os.environ.get('PROGRAMFILES', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
-            os.path.join(os.environ.get('PROGRAMFILES(X86)', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
-            'C:\\ffmpeg\\bin\\ffmpeg.exe',
-            os.path.expanduser('~\\ffmpeg\\bin\\ffmpeg.exe'),
-        ]
-        
-        # Expand wildcards and check each path
-        for path_pattern in possible_paths:
-            expanded_paths = glob.glob(path_pattern)
-            for path in expanded_paths:
-                if os.path.exists(path):
-                    return path
-                    
-        return None
-
-    def check_ffmpeg(self):
-        """Check if FFmpeg is available"""
-        if self.ffmpeg_path and os.path.exists(self.ffmpeg_path):
-            try:
-                result = subprocess.run([self.ffmpeg_path, '-version'], 
-                                      capture_output=True, text=True, timeout=10)
-                return result.returncode == 0
-            except:
-                return False
-        return False
-
-    def get_playlist_info(self, playlist_url):
-        """Get playlist information using yt-dlp"""
-        try:
-            ydl_opts = {
-                'quiet': True,
-                'extract_flat': True,
-                'force_json': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(playlist_url, download=False)
-                return info
-        except Exception as e:
-            self.log_signal.emit(f"Error getting playlist info: {str(e)}", self.get_playlist_name(playlist_url))
-            return None
-
-    def get_playlist_name(self, playlist_url):
-        """Extract playlist name from URL or use a default name"""
-        try:
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
-                info = ydl.extract_info(playlist_url, download=False)
-                return info.get('title', f"Playlist_{hash(playlist_url)}")
-        except:
-            return f"Playlist_{hash(playlist_url)}"
-
-    def download_video(self, video_url, index, total, playlist_name):
-        """Download individual video using yt-dlp"""
-        try:
-            # Set options based on format choice
-            if self.format_choice == "mp3":
-                # Check if FFmpeg is available for MP3 conversion
-                if not self.check_ffmpeg():
-                    self.log_signal.emit("FFmpeg not found. Downloading as best audio format...", playlist_name)
-                    # Fallback: download as best audio without conversion
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': os.path.join(self.output_path, playlist_name, '%(title)s.%(ext)s'),
-                        'quiet': True,
-                        'no_warnings': True,
-                    }
-                else:
-                    # Use FFmpeg for MP3 conversion with explicit path
-                    ydl_opts = {
-                        'format': 'bestaudio/best',
-                        'outtmpl': os.path.join(self.output_path, playlist_name, '%(title)s.%(ext)s'),
-                        'postprocessors': [{
-                            'key': 'FFmpegExtractAudio',
-                            'preferredcodec': 'mp3',
-                            'preferredquality': '192',
-                        }],
-                        'ffmpeg_location': os.path.dirname(self.ffmpeg_path),
-                        'quiet': True,
-                        'no_warnings': True,
-                    }
-            else:  # mp4
-                ydl_opts = {
-                    'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                    'outtmpl': os.path.join(self.output_path, playlist_name, '%(title)s.%(ext)s'),
-                    'merge_output_format': 'mp4',
-                    'quiet': True,
-                    'no_warnings': True,
-                }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                self.log_signal.emit(f"✓ Downloaded: {info.get('title', 'Unknown')}", playlist_name)
-                return True
-                
-        except Exception as e:
-            error_msg = str(e)
-            # Clean up error message by removing ANSI color codes
-            clean_error = re.sub(r'\x1b\[[0-9;]*m', '', error_msg)
-            self.log_signal.emit(f"✗ Error downloading video: {clean_error}", playlist_name)
-            return False
+        self.runner = QueueRunner(
+            job_queue,
+            max_workers=max_workers,
+            use_archive=use_archive,
+            metadata_ttl=metadata_ttl,
+            sync=sync,
+            prune=prune,
+            rate_limit=rate_limit,
+            schedule=schedule,
+            dedup=dedup,
+            report_path=report_path,
+            on_progress=progress_board.update,
+            on_log=self.log_signal.emit,
+            on_finished=self.finished_signal.emit,
+            on_playlist_start=progress_board.start_playlist,
+            on_transfer=progress_board.update_transfers,
+        )
 
     def run(self):
-        try:
-            # Check for FFmpeg if MP3 is selected
-            if self.format_choice == "mp3":
-                if self.check_ffmpeg():
-                    self.log_signal.emit(f"✅ Using FFmpeg at: {self.ffmpeg_path}", "System")
-                else:
-                    self.log_signal.emit("⚠️ FFmpeg not found. Audio files will be downloaded in original format.", "System")
-                    self.log_signal.emit("You can convert them to MP3 later using other tools.", "System")
-            
-            # Create main output directory if it doesn't exist
-            if not os.path.exists(self.output_path):
-                os.makedirs(self.output_path)
-
-            total_successful = 0
-            total_videos_all = 0
-            
-            for playlist_url in self.playlist_urls:
-                if not self.is_running:
-                    break
-                    
-                playlist_name = self.get_playlist_name(playlist_url)
-                
-                # Create playlist-specific directory
-                playlist_output_path = os.path.join(self.output_path, playlist_name)
-                if not os.path.exists(playlist_output_path):
-                    os.makedirs(playlist_output_path)
-
-                # Get playlist information
-                self.log_signal.emit("Getting playlist information...", playlist_name)
-                playlist_info = self.get_playlist_info(playlist_url)
-                
-                if not playlist_info or 'entries' not in playlist_info:
-                    self.log_signal.emit("Could not retrieve playlist information.", playlist_name)
-                    continue
-                
-                # Extract video URLs
-                video_urls = []
-                for entry in playlist_info['entries']:
-                    if entry and 'url' in entry:
-                        video_urls.append(entry['url'])
-                
-                total_videos = len(video_urls)
-                if total_videos == 0:
-                    self.log_signal.emit("No videos found in the playlist.", playlist_name)
-                    continue
-                    
-                total_videos_all += total_videos
-                self.playlist_start_signal.emit(playlist_name, total_videos)
-                self.log_signal.emit(f"Found {total_videos} videos in the playlist", playlist_name)
-                
-                successful_downloads = 0
-                
-                for index, video_url in enumerate(video_urls, 1):
-                    if not self.is_running:
-                        break
-                    
-                    # Update progress
-                    progress = int((index) / total_videos * 100)
-                    self.progress_signal.emit(index, total_videos, progress, playlist_name)
-                    
-                    # Download the video
-                    if self.download_video(video_url, index, total_videos, playlist_name):
-                        successful_downloads += 1
-                
-                total_successful += successful_downloads
-                self.log_signal.emit(f"Playlist completed: {successful_downloads}/{total_videos} videos downloaded", playlist_name)
-            
-            if self.is_running:
-                message = f"All downloads completed! {total_successful}/{total_videos_all} videos downloaded successfully across {len(self.playlist_urls)} playlists."
-                self.finished_signal.emit(True, message, "System")
-            else:
-                self.finished_signal.emit(False, "Download cancelled by user.", "System")
-            
-        except Exception as e:
-            self.finished_signal.emit(False, f"Error: {str(e)}", "System")
+        self.runner.run()
     
     def stop(self):
-        self.is_running = False
+        self.runner.stop()
 
 class FFmpegChecker(QThread):
     finished_signal = pyqtSignal(bool, str)
@@ -225,42 +53,112 @@ class FFmpegChecker(QThread):
     def run(self):
         """Check if FFmpeg is available"""
         try:
-            # Check if ffmpeg is in PATH
-            ffmpeg_path = shutil.which('ffmpeg')
-            if ffmpeg_path:
-                self.finished_signal.emit(True, ffmpeg_path)
-                return
-                
-            # Check common installation paths
-            possible_paths = [
-                os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Microsoft', 'WinGet', 'Packages', 'Gyan.FFmpeg.Essentials_*', 'bin', 'ffmpeg.exe'),
-                os.path.join(os.environ.get('PROGRAMFILES', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
-                os.path.join(os.environ.get('PROGRAMFILES(X86)', ''), 'ffmpeg', 'bin', 'ffmpeg.exe'),
-                'C:\\ffmpeg\\bin\\ffmpeg.exe',
-                os.path.expanduser('~\\ffmpeg\\bin\\ffmpeg.exe'),
-            ]
-            
-            # Expand wildcards and check each path
-            for path_pattern in possible_paths:
-                expanded_paths = glob.glob(path_pattern)
-                for path in expanded_paths:
-                    if os.path.exists(path):
-                        self.finished_signal.emit(True, path)
-                        return
-            
-            self.finished_signal.emit(False, "")
-            
+            info = FFmpegService.get()
+            self.finished_signal.emit(info.available, info.path or "")
         except Exception as e:
             self.finished_signal.emit(False, str(e))
 
+class PlaylistProgressModel(QAbstractListModel):
+    """One row per playlist, refreshed from a ProgressBoard once per frame
+
+    Rows changed since the previous frame are announced with a single
+    dataChanged, so the view repaints only those of them that are visible.
+    """
+    RowRole = Qt.UserRole  # the row dict
+
+    def __init__(self, board, parent=None):
+        super().__init__(parent)
+        self.board = board
+        self.rows = []
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return self.row_text(row)
+        if role == self.RowRole:
+            return row
+        return None
+
+    @staticmethod
+    def row_text(row):
+        text = f"{row['name']}: {row['current']}/{row['total']} videos"
+        if row['active']:
+            text += f" · {row['active']} active · {format_bytes(row['speed'])}/s"
+            if row['eta'] is not None:
+                text += f" · ETA {format_eta(row['eta'])}"
+        return text
+
+    def refresh(self):
+        """Pull the rows changed since the last frame from the board"""
+        count, changed = self.board.changes()
+        if count > len(self.rows):
+            self.beginInsertRows(QModelIndex(), len(self.rows), count - 1)
+            self.rows.extend([None] * (count - len(self.rows)))
+            for number, row in changed.items():
+                self.rows[number] = row
+            self.endInsertRows()
+        elif changed:
+            for number, row in changed.items():
+                self.rows[number] = row
+        if changed:
+            self.dataChanged.emit(self.index(min(changed)), self.index(max(changed)))
+
+    def clear(self):
+        self.beginResetModel()
+        self.board.clear()
+        self.rows = []
+        self.endResetModel()
+
+class PlaylistProgressDelegate(QStyledItemDelegate):
+    """Paints a row as its status line over a progress bar, without a widget per playlist"""
+    LINE_HEIGHT = 20
+    BAR_HEIGHT = 18
+
+    def sizeHint(self, option, index):
+        return QSize(option.rect.width(), self.LINE_HEIGHT + self.BAR_HEIGHT + 8)
+
+    def paint(self, painter, option, index):
+        row = index.data(PlaylistProgressModel.RowRole)
+        style = option.widget.style() if option.widget else QApplication.style()
+        if option.state & QStyle.State_Selected:
+            painter.fillRect(option.rect, option.palette.highlight())
+        
+        text_rect = option.rect.adjusted(4, 2, -4, 0)
+        text_rect.setHeight(self.LINE_HEIGHT)
+        painter.save()
+        font = painter.font()
+        font.setBold(True)
+        painter.setFont(font)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter, index.data(Qt.DisplayRole))
+        painter.restore()
+        
+        bar = QStyleOptionProgressBar()
+        bar.rect = option.rect.adjusted(4, self.LINE_HEIGHT + 4, -4, -2)
+        bar.rect.setHeight(self.BAR_HEIGHT)
+        bar.minimum = 0
+        bar.maximum = 100
+        # Partially downloaded videos move the bar between completions
+        bar.progress = min(int((row['current'] + row['partial']) / row['total'] * 100), 100) if row['total'] else 0
+        bar.text = f"{row['name']} - {bar.progress}%"
+        bar.textVisible = True
+        bar.state = option.state | QStyle.State_Horizontal
+        style.drawControl(QStyle.CE_ProgressBar, bar, painter, option.widget)
+
 class YouTubeDownloaderApp(QMainWindow):
     def __init__(self):
         super().__init__()
+        self.log_sink = LogSink()
+        self.progress_board = ProgressBoard()
+        self.job_queue = JobQueue()
         self.initUI()
         self.download_thread = None
         self.ffmpeg_checker = None
-        self.playlist_progress_bars = {}  # Store progress bars for each playlist
-        self.playlist_labels = {}  # Store labels for each playlist
+        self.close_requested = False
 
     def initUI(self):
         self.setWindowTitle('YouTube Multi-Playlist Downloader')
@@ -294,9 +192,17 @@ class YouTubeDownloaderApp(QMainWindow):
         urls_frame.setFrameStyle(QFrame.Box)
         urls_layout = QVBoxLayout(urls_frame)
         
+        urls_header = QHBoxLayout()
         urls_label = QLabel('Playlist URLs (one per line):')
         urls_label.setStyleSheet("font-weight: bold;")
-        urls_layout.addWidget(urls_label)
+        self.queue_label = QLabel('')
+        job_file_btn = QPushButton('Load Job File...')
+        job_file_btn.clicked.connect(self.import_job_file)
+        urls_header.addWidget(urls_label)
+        urls_header.addStretch()
+        urls_header.addWidget(self.queue_label)
+        urls_header.addWidget(job_file_btn)
+        urls_layout.addLayout(urls_header)
         
         self.urls_input = QTextEdit()
         self.urls_input.setPlaceholderText('https://www.youtube.com/playlist?list=...\nhttps://www.youtube.com/playlist?list=...\nhttps://www.youtube.com/playlist?list=...')
@@ -318,6 +224,27 @@ class YouTubeDownloaderApp(QMainWindow):
         format_layout.addWidget(self.format_combo)
         options_layout.addLayout(format_layout)
         
+        # Parallel downloads
+        workers_layout = QVBoxLayout()
+        workers_label = QLabel('Parallel Downloads:')
+        workers_label.setStyleSheet("font-weight: bold;")
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, 16)
+        self.workers_spin.setValue(DEFAULT_MAX_WORKERS)
+        workers_layout.addWidget(workers_label)
+        workers_layout.addWidget(self.workers_spin)
+        options_layout.addLayout(workers_layout)
+        
+        # Queue priority of the URLs added next; higher runs first
+        priority_layout = QVBoxLayout()
+        priority_label = QLabel('Priority:')
+        priority_label.setStyleSheet("font-weight: bold;")
+        self.priority_spin = QSpinBox()
+        self.priority_spin.setRange(-100, 100)
+        priority_layout.addWidget(priority_label)
+        priority_layout.addWidget(self.priority_spin)
+        options_layout.addLayout(priority_layout)
+        
         # Output path
         path_layout = QVBoxLayout()
         path_label = QLabel('Output Folder:')
@@ -335,6 +262,48 @@ class YouTubeDownloaderApp(QMainWindow):
         
         main_layout.addLayout(options_layout)
         
+        self.archive_check = QCheckBox('Skip videos already downloaded in previous runs')
+        self.archive_check.setChecked(True)
+        main_layout.addWidget(self.archive_check)
+        
+        self.dedup_check = QCheckBox('Download videos shared by several playlists once and link the copies')
+        self.dedup_check.setChecked(True)
+        main_layout.addWidget(self.dedup_check)
+        
+        # Incremental sync
+        sync_layout = QHBoxLayout()
+        self.sync_check = QCheckBox('Sync: only download videos added since the last run')
+        self.sync_check.toggled.connect(lambda checked: self.prune_check.setEnabled(checked))
+        self.prune_check = QCheckBox('Delete videos removed from the playlist')
+        self.prune_check.setEnabled(False)
+        ttl_label = QLabel('Reuse playlist listings for (min):')
+        self.ttl_spin = QSpinBox()
+        self.ttl_spin.setRange(0, 24 * 60)
+        self.ttl_spin.setValue(0)
+        sync_layout.addWidget(self.sync_check)
+        sync_layout.addWidget(self.prune_check)
+        sync_layout.addStretch()
+        sync_layout.addWidget(ttl_label)
+        sync_layout.addWidget(self.ttl_spin)
+        main_layout.addLayout(sync_layout)
+        
+        # Bandwidth limit; the speed can be changed while downloading
+        bandwidth_layout = QHBoxLayout()
+        rate_label = QLabel('Speed limit (MB/s):')
+        self.rate_spin = QDoubleSpinBox()
+        self.rate_spin.setRange(0, 1000)
+        self.rate_spin.setSingleStep(0.5)
+        self.rate_spin.setSpecialValueText('Unlimited')
+        self.rate_spin.valueChanged.connect(self.set_rate_limit)
+        schedule_label = QLabel('Schedule:')
+        self.schedule_input = QLineEdit()
+        self.schedule_input.setPlaceholderText('e.g. 09:00-18:00=2M (overrides the speed limit in these hours)')
+        bandwidth_layout.addWidget(rate_label)
+        bandwidth_layout.addWidget(self.rate_spin)
+        bandwidth_layout.addWidget(schedule_label)
+        bandwidth_layout.addWidget(self.schedule_input)
+        main_layout.addLayout(bandwidth_layout)
+        
         # Progress section
         progress_frame = QFrame()
         progress_frame.setFrameStyle(QFrame.Box)
@@ -345,10 +314,29 @@ class YouTubeDownloaderApp(QMainWindow):
         progress_title.setAlignment(Qt.AlignCenter)
         progress_layout.addWidget(progress_title)
         
-        # Container for individual playlist progress
-        self.progress_container = QWidget()
-        self.progress_container_layout = QVBoxLayout(self.progress_container)
-        progress_layout.addWidget(self.progress_container)
+        # Overall throughput across all active downloads
+        self.transfer_label = QLabel('')
+        self.transfer_label.setAlignment(Qt.AlignCenter)
+        progress_layout.addWidget(self.transfer_label)
+        
+        # One painted row per playlist; only the visible rows are drawn
+        self.progress_model = PlaylistProgressModel(self.progress_board, self)
+        self.progress_view = QListView()
+        self.progress_view.setModel(self.progress_model)
+        self.progress_view.setItemDelegate(PlaylistProgressDelegate(self.progress_view))
+        self.progress_view.setUniformItemSizes(True)
+        self.progress_view.setMinimumHeight(150)
+        progress_layout.addWidget(self.progress_view)
+        
+        skip_layout = QHBoxLayout()
+        skip_layout.addStretch()
+        skip_video_btn = QPushButton('Skip Video...')
+        skip_video_btn.clicked.connect(lambda: self.skip_video(self.selected_playlist()))
+        skip_playlist_btn = QPushButton('Skip Playlist')
+        skip_playlist_btn.clicked.connect(lambda: self.skip_playlist(self.selected_playlist()))
+        skip_layout.addWidget(skip_video_btn)
+        skip_layout.addWidget(skip_playlist_btn)
+        progress_layout.addLayout(skip_layout)
         
         main_layout.addWidget(progress_frame)
         
@@ -371,49 +359,64 @@ class YouTubeDownloaderApp(QMainWindow):
         log_label = QLabel('Download Log:')
         log_label.setStyleSheet("font-weight: bold;")
         main_layout.addWidget(log_label)
-        self.log_area = QTextEdit()
+        self.log_area = QPlainTextEdit()
         self.log_area.setReadOnly(True)
+        # Oldest lines are discarded once the view holds LOG_MAX_LINES
+        self.log_area.setMaximumBlockCount(LOG_MAX_LINES)
         main_layout.addWidget(self.log_area)
         
-        # Check FFmpeg status
+        self.log_file_check = QCheckBox('Save full log to file')
+        main_layout.addWidget(self.log_file_check)
+        self.report_check = QCheckBox('Save run report (timings and throughput, JSON)')
+        main_layout.addWidget(self.report_check)
+        
+        # Append buffered log lines in batches instead of once per message
+        self.log_timer = QTimer(self)
+        self.log_timer.timeout.connect(self.flush_log)
+        self.log_timer.start(LOG_FLUSH_INTERVAL_MS)
+        
+        # Repaint progress at a fixed frame rate however often the workers report
+        self.progress_timer = QTimer(self)
+        self.progress_timer.timeout.connect(self.refresh_progress)
+        self.progress_timer.start(PROGRESS_FRAME_MS)
+        
+        # Deferred until the window is up: FFmpeg status, then yt-dlp loads in the background
         QTimer.singleShot(0, self.check_ffmpeg_status)
+        QTimer.singleShot(0, yt_dlp.preload)
+        # Offer to pick up a batch interrupted in a previous session
+        QTimer.singleShot(0, self.offer_resume)
+        QTimer.singleShot(0, self.refresh_queue_label)
 
-    def add_playlist_progress(self, playlist_name, total_videos):
-        """Add progress bar for a new playlist"""
-        # Remove existing progress if it exists
-        if playlist_name in self.playlist_progress_bars:
-            old_progress = self.playlist_progress_bars[playlist_name]
-            old_label = self.playlist_labels[playlist_name]
-            self.progress_container_layout.removeWidget(old_progress)
-            self.progress_container_layout.removeWidget(old_label)
-            old_progress.deleteLater()
-            old_label.deleteLater()
-        
-        # Create new progress elements
-        playlist_label = QLabel(f"{playlist_name}: 0/{total_videos} videos")
-        playlist_label.setStyleSheet("font-weight: bold; margin-top: 5px;")
-        
-        progress_bar = QProgressBar()
-        progress_bar.setValue(0)
-        progress_bar.setFormat(f"{playlist_name} - %p%")
-        
-        # Store references
-        self.playlist_labels[playlist_name] = playlist_label
-        self.playlist_progress_bars[playlist_name] = progress_bar
-        
-        # Add to layout
-        self.progress_container_layout.addWidget(playlist_label)
-        self.progress_container_layout.addWidget(progress_bar)
+    def refresh_progress(self):
+        """Show the playlist rows and overall speed that changed since the last frame"""
+        self.progress_model.refresh()
+        if self.download_thread and self.download_thread.isRunning():
+            self.transfer_label.setText(f"Overall: {format_bytes(self.progress_board.speed)}/s")
+    
+    def selected_playlist(self):
+        """Name of the playlist selected in the progress list, or None"""
+        index = self.progress_view.currentIndex()
+        return self.progress_model.rows[index.row()]['name'] if index.isValid() else None
 
     def check_ffmpeg_status(self):
         """Check if FFmpeg is available and update status"""
+        info = FFmpegService.cached()
+        if info is not None:
+            self.update_ffmpeg_status(info.available, info.path or "")
+            return
+        # Searching install folders and running FFmpeg can be slow; do it off the GUI thread
         self.ffmpeg_checker = FFmpegChecker()
         self.ffmpeg_checker.finished_signal.connect(self.update_ffmpeg_status)
         self.ffmpeg_checker.start()
         
     def update_ffmpeg_status(self, status, path):
-        if status:
+        info = FFmpegService.cached()
+        if status and not info.supports_mp3:
+            self.ffmpeg_status.setText(f'FFmpeg: ⚠️ Installed at {path} without an MP3 encoder')
+            self.ffmpeg_status.setStyleSheet("color: orange; font-weight: bold;")
+        elif status:
             self.ffmpeg_status.setText(f'FFmpeg: ✅ Installed at {path}')
+            self.ffmpeg_status.setToolTip(info.version)
             self.ffmpeg_status.setStyleSheet("color: green; font-weight: bold;")
         else:
             self.ffmpeg_status.setText('FFmpeg: ❌ Not found (MP3 conversion will not work)')
@@ -428,34 +431,119 @@ class YouTubeDownloaderApp(QMainWindow):
         if folder:
             self.path_input.setText(folder)
     
-    def start_download(self):
-        urls_text = self.urls_input.toPlainText().strip()
-        if not urls_text:
-            QMessageBox.warning(self, 'Input Error', 'Please enter at least one YouTube playlist URL')
+    def offer_resume(self):
+        """Ask whether to resume an unfinished batch recorded in the job journal"""
+        journal = JobJournal.latest_unfinished()
+        if journal is None:
             return
         
-        # Parse URLs (split by newlines and filter empty lines)
-        playlist_urls = [url.strip() for url in urls_text.split('\n') if url.strip()]
-        
-        # Validate URLs
-        valid_urls = []
-        for url in playlist_urls:
-            if 'playlist?list=' in url or 'list=' in url:
-                valid_urls.append(url)
-            else:
-                self.log_area.append(f"❌ Invalid playlist URL: {url}")
-        
-        if not valid_urls:
-            QMessageBox.warning(self, 'Input Error', 'Please enter valid YouTube playlist URLs')
+        done, total = journal.progress()
+        data = journal.data
+        # Playlists the batch already finished are not queued again
+        urls = [url for url in data['playlist_urls']
+                if data['playlists'].get(url, {}).get('status') != JobJournal.DONE]
+        reply = QMessageBox.question(self, 'Resume Download',
+                                     f"An unfinished download of {len(urls)} playlists "
+                                     f"was found ({done}/{total} videos done).\n\n"
+                                     'Do you want to resume it? No abandons it and removes its '
+                                     'playlists from the job queue.',
+                                     QMessageBox.Yes | QMessageBox.No)
+        if reply == QMessageBox.No:
+            # Otherwise its queued jobs would run again, from scratch, on the next download
+            jobs = []
+            for url in urls:
+                try:
+                    jobs.append(make_job(url, data['format'], data['output_path']))
+                except ValueError:
+                    continue
+            self.job_queue.remove(jobs)
+            journal.discard()
+            self.refresh_queue_label()
             return
         
+        # Same URLs, format and folder map back onto the same journal
+        self.urls_input.setPlainText('\n'.join(urls))
+        self.format_combo.setCurrentText(data['format'])
+        self.path_input.setText(data['output_path'])
+        self.start_download()
+    
+    def refresh_queue_label(self):
+        pending = self.job_queue.counts()[JobQueue.PENDING]
+        self.queue_label.setText(f"{pending} jobs queued" if pending else '')
+    
+    def queue_urls(self):
+        """Add the URLs in the input box to the job queue; returns False on invalid input"""
+        urls = [url.strip() for url in self.urls_input.toPlainText().split('\n') if url.strip()]
+        if not urls:
+            return True
+        
         output_path = self.path_input.text().strip()
         if not output_path:
             QMessageBox.warning(self, 'Input Error', 'Please select an output folder')
+            return False
+        
+        jobs = []
+        for url in urls:
+            try:
+                jobs.append(make_job(url, self.format_combo.currentText(), output_path, self.priority_spin.value()))
+            except ValueError:
+                self.log_sink.write(f"❌ Invalid playlist URL: {url}")
+        if not jobs:
+            QMessageBox.warning(self, 'Input Error', 'Please enter valid YouTube playlist URLs')
+            return False
+        
+        added, updated = self.job_queue.add(jobs)
+        message = f"📋 Queued {added} playlists"
+        if updated:
+            message += f", {updated} were already in the queue"
+        self.log_sink.write(message)
+        self.refresh_queue_label()
+        return True
+    
+    def import_job_file(self):
+        """Add the jobs of a JSON, YAML or CSV job file to the queue"""
+        path, _ = QFileDialog.getOpenFileName(self, 'Load Job File', '',
+                                              'Job files (*.json *.yaml *.yml *.csv *.txt);;All files (*)')
+        if not path:
+            return
+        try:
+            jobs = load_job_file(path, self.format_combo.currentText(), self.path_input.text().strip() or '.',
+                                 self.priority_spin.value())
+        except (OSError, ValueError) as e:
+            QMessageBox.warning(self, 'Job File Error', str(e))
+            return
+        added, updated = self.job_queue.add(jobs)
+        message = f"📋 Queued {added} playlists from {os.path.basename(path)}"
+        if updated:
+            message += f", {updated} were already in the queue"
+        self.log_sink.write(message)
+        self.refresh_queue_label()
+    
+    def start_download(self):
+        if self.download_thread and self.download_thread.isRunning():
+            # The running queue picks new jobs up with its next batch
+            if self.queue_urls():
+                self.urls_input.clear()
+            return
+        
+        if not self.queue_urls():
+            return
+        # Jobs left running by a run that crashed or was killed go back in the queue
+        self.job_queue.requeue_running()
+        if not self.job_queue.counts()[JobQueue.PENDING]:
+            QMessageBox.warning(self, 'Input Error', 'Please enter at least one YouTube playlist URL')
             return
         
         format_choice = self.format_combo.currentText()
         
+        schedule = None
+        if self.schedule_input.text().strip():
+            try:
+                schedule = BandwidthSchedule.parse(self.schedule_input.text())
+            except ValueError as e:
+                QMessageBox.warning(self, 'Input Error', f'Invalid bandwidth schedule: {e}')
+                return
+        
         # Warn about FFmpeg if MP3 is selected
         if format_choice == "mp3":
             reply = QMessageBox.question(self, 'FFmpeg Check', 
@@ -465,89 +553,152 @@ class YouTubeDownloaderApp(QMainWindow):
             if reply == QMessageBox.No:
                 return
         
-        # Disable UI elements during download
-        self.download_btn.setEnabled(False)
+        # Disable UI elements during download; URLs, format, folder and priority
+        # stay editable for jobs added to the queue while it runs
+        self.download_btn.setText('Add to Queue')
         self.cancel_btn.setEnabled(True)
-        self.urls_input.setEnabled(False)
-        self.format_combo.setEnabled(False)
-        self.path_input.setEnabled(False)
+        self.workers_spin.setEnabled(False)
+        self.archive_check.setEnabled(False)
+        self.dedup_check.setEnabled(False)
+        self.sync_check.setEnabled(False)
+        self.prune_check.setEnabled(False)
+        self.ttl_spin.setEnabled(False)
+        self.schedule_input.setEnabled(False)
+        self.log_file_check.setEnabled(False)
+        self.report_check.setEnabled(False)
         
         # Clear previous log and progress
         self.log_area.clear()
-        self.playlist_progress_bars.clear()
-        self.playlist_labels.clear()
+        self.progress_model.clear()
+        self.transfer_label.setText('')
         
-        # Clear progress container
-        for i in reversed(range(self.progress_container_layout.count())): 
-            self.progress_container_layout.itemAt(i).widget().setParent(None)
+        if self.log_file_check.isChecked():
+            log_path = self.log_sink.enable_file_log()
+            self.log_sink.write(f"📝 Saving full log to {log_path}")
+        else:
+            self.log_sink.disable_file_log()
         
-        self.log_area.append("🚀 Starting download of multiple playlists...")
+        report_path = None
+        if self.report_check.isChecked():
+            report_path = os.path.join(APP_DATA_DIR, 'reports', time.strftime('run-%Y%m%d-%H%M%S.json'))
+        
+        self.log_sink.write("🚀 Starting download of multiple playlists...")
         
         # Start download thread
-        self.download_thread = DownloadThread(valid_urls, format_choice, output_path)
-        self.download_thread.progress_signal.connect(self.update_progress)
-        self.download_thread.log_signal.connect(self.update_log)
+        self.download_thread = DownloadThread(self.job_queue, self.progress_board,
+                                              max_workers=self.workers_spin.value(),
+                                              use_archive=self.archive_check.isChecked(),
+                                              metadata_ttl=self.ttl_spin.value() * 60,
+                                              sync=self.sync_check.isChecked(),
+                                              prune=self.prune_check.isChecked(),
+                                              rate_limit=self.rate_spin.value() * 1024 * 1024,
+                                              schedule=schedule,
+                                              dedup=self.dedup_check.isChecked(),
+                                              report_path=report_path)
+        # Direct connection: workers write straight into the thread-safe sink
+        self.download_thread.log_signal.connect(self.log_sink.write, Qt.DirectConnection)
         self.download_thread.finished_signal.connect(self.download_finished)
-        self.download_thread.playlist_start_signal.connect(self.add_playlist_progress)
         self.download_thread.start()
     
+    def set_rate_limit(self, value):
+        """Apply a new speed limit to the running download, if any"""
+        if self.download_thread and self.download_thread.isRunning():
+            self.download_thread.runner.bandwidth.set_rate(value * 1024 * 1024)
+            limit = f"{value:g} MB/s" if value else "unlimited"
+            self.log_sink.write(f"🚦 Speed limit changed to {limit}")
+    
     def cancel_download(self):
         if self.download_thread and self.download_thread.isRunning():
+            # Returns at once; the UI resets when the engine reports it has stopped
             self.download_thread.stop()
-            self.download_thread.wait()
-            self.log_area.append("⏹️ Download cancelled by user")
-            self.reset_ui()
+            self.cancel_btn.setEnabled(False)
+            self.log_sink.write("⏹️ Cancelling downloads...")
+    
+    def skip_video(self, playlist_name):
+        """Let the user pick one of the playlist's running downloads and skip it"""
+        if not (self.download_thread and self.download_thread.isRunning()):
+            return
+        if playlist_name is None:
+            QMessageBox.information(self, 'Skip Video', 'Select a playlist in the progress list first.')
+            return
+        videos = {}
+        for item in self.progress_board.transfers(playlist_name):
+            position = item['job'][1]
+            videos[f"#{position} {item['title']}"] = position
+        if not videos:
+            QMessageBox.information(self, 'Skip Video', 'No video of this playlist is downloading right now.')
+            return
+        choice, ok = QInputDialog.getItem(self, 'Skip Video', 'Video to skip:', list(videos), 0, False)
+        if ok:
+            self.download_thread.runner.abort_video(playlist_name, videos[choice])
     
-    def update_progress(self, current, total, percentage, playlist_name):
-        """Update progress for a specific playlist"""
-        if playlist_name in self.playlist_progress_bars:
-            self.playlist_progress_bars[playlist_name].setValue(percentage)
-        if playlist_name in self.playlist_labels:
-            self.playlist_labels[playlist_name].setText(f"{playlist_name}: {current}/{total} videos")
+    def skip_playlist(self, playlist_name):
+        if playlist_name and self.download_thread and self.download_thread.isRunning():
+            self.download_thread.runner.abort_playlist(playlist_name)
     
-    def update_log(self, message, playlist_name):
-        """Add log message with playlist context"""
-        if playlist_name != "System":
-            formatted_message = f"[{playlist_name}] {message}"
-        else:
-            formatted_message = message
+    def flush_log(self):
+        """Append all buffered log lines to the log view in one batch"""
+        lines = self.log_sink.drain()
+        if not lines:
+            return
         
-        self.log_area.append(formatted_message)
-        # Auto-scroll to bottom
-        self.log_area.verticalScrollBar().setValue(
-            self.log_area.verticalScrollBar().maximum()
-        )
+        scrollbar = self.log_area.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.log_area.appendPlainText('\n'.join(lines))
+        # Auto-scroll to bottom unless the user has scrolled up to read
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
     
     def download_finished(self, success, message, playlist_name):
+        if self.close_requested:
+            # The window closes as soon as the thread exits
+            return
         if success:
-            self.log_area.append(f"✅ {message}")
+            self.log_sink.write(f"✅ {message}")
+            self.flush_log()
+            self.refresh_progress()
             QMessageBox.information(self, 'Success', message)
         else:
-            self.log_area.append(f"❌ {message}")
+            self.log_sink.write(f"❌ {message}")
+            self.flush_log()
+            self.refresh_progress()
             QMessageBox.warning(self, 'Download Status', message)
         
         self.reset_ui()
     
     def reset_ui(self):
-        self.download_btn.setEnabled(True)
+        self.download_btn.setText('Download All Playlists')
         self.cancel_btn.setEnabled(False)
-        self.urls_input.setEnabled(True)
-        self.format_combo.setEnabled(True)
-        self.path_input.setEnabled(True)
+        self.workers_spin.setEnabled(True)
+        self.archive_check.setEnabled(True)
+        self.dedup_check.setEnabled(True)
+        self.sync_check.setEnabled(True)
+        self.prune_check.setEnabled(self.sync_check.isChecked())
+        self.ttl_spin.setEnabled(True)
+        self.schedule_input.setEnabled(True)
+        self.log_file_check.setEnabled(True)
+        self.report_check.setEnabled(True)
+        self.refresh_queue_label()
     
     def closeEvent(self, event):
         if self.download_thread and self.download_thread.isRunning():
+            if self.close_requested:
+                event.ignore()
+                return
             reply = QMessageBox.question(
                 self, 'Download in Progress',
                 'A download is in progress. Are you sure you want to quit?',
                 QMessageBox.Yes | QMessageBox.No
             )
             if reply == QMessageBox.Yes:
+                # Close once the engine has wound down instead of blocking the event loop
+                self.close_requested = True
+                self.download_thread.finished.connect(self.close)
                 self.download_thread.stop()
-                self.download_thread.wait()
-            else:
-                event.ignore()
-                return
+                self.cancel_btn.setEnabled(False)
+                self.log_sink.write("⏹️ Stopping downloads before closing...")
+            event.ignore()
+            return
 
         if self.ffmpeg_checker and self.ffmpeg_checker.isRunning():
             self.ffmpeg_checker.wait()
@@ -0,0 +1,258 @@
+"""Headless command-line entry point for the playlist downloader.
+
+Uses the same DownloadEngine as the GUI but never imports PyQt5, so it can
+run on machines without a display:
+
+    python youtube_downloader_cli.py -f playlists.txt --format mp3 -o /srv/music
+
+Many playlists with their own format, folder and priority go through the
+persistent job queue; jobs can be added from another shell while it runs:
+
+    python youtube_downloader_cli.py --job-file jobs.yaml
+    python youtube_downloader_cli.py --queue-add --priority 5 URL
+
+While it runs, these commands can be typed followed by Enter:
+
+    limit 2M                   change the bandwidth limit (limit 0 for none)
+    skip-playlist NAME         skip the rest of a playlist
+    skip-video POSITION NAME   skip one video of a playlist
+
+Exit status: 0 when every video was downloaded (or already archived),
+1 on a fatal error, 2 on invalid arguments, 3 when some videos or
+playlists failed, and 130 when interrupted.
+"""
+import argparse
+import logging
+import logging.handlers
+import os
+import sys
+import threading
+
+from downloader_engine import (DownloadEngine, BandwidthSchedule, JobQueue, QueueRunner, DEFAULT_MAX_WORKERS,
+                               LOG_FILE_MAX_BYTES, LOG_FILE_BACKUPS, format_bytes, load_job_file, make_job,
+                               parse_rate)
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+EXIT_INTERRUPTED = 130
+
+logger = logging.getLogger('youtube_downloader')
+
+
+def read_playlist_file(path):
+    """Read playlist URLs from a file, one per line; blank lines and # comments are skipped"""
+    stream = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        return [line.strip() for line in stream if line.strip() and not line.lstrip().startswith('#')]
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def argument_type(parse):
+    """Wrap a parser raising ValueError so argparse reports its message"""
+    def convert(text):
+        try:
+            return parse(text)
+        except ValueError as e:
+            raise argparse.ArgumentTypeError(str(e))
+    return convert
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Download YouTube playlists without the GUI.')
+    parser.add_argument('urls', nargs='*', help='playlist URLs')
+    parser.add_argument('-f', '--file', action='append', default=[],
+                        help="file with one playlist URL per line ('-' for stdin); may be repeated")
+    parser.add_argument('--job-file', action='append', default=[], metavar='PATH',
+                        help='JSON, YAML or CSV file of jobs (url, format, output, priority) '
+                             'to add to the job queue and run; may be repeated')
+    parser.add_argument('--queue', action='store_true',
+                        help='run every pending job in the persistent job queue, after adding the given URLs')
+    parser.add_argument('--queue-add', action='store_true',
+                        help='only add the given URLs and job files to the job queue, e.g. while it runs')
+    parser.add_argument('--priority', type=int, default=0,
+                        help='queue priority of the given URLs; higher runs first (default: %(default)s)')
+    parser.add_argument('--format', choices=['mp4', 'mp3'], default='mp4')
+    parser.add_argument('-o', '--output', default=os.path.expanduser('~/Downloads/YouTube_Playlists'),
+                        help='output folder (default: %(default)s)')
+    parser.add_argument('-j', '--jobs', type=int, default=DEFAULT_MAX_WORKERS,
+                        help='parallel downloads (default: %(default)s)')
+    parser.add_argument('--no-archive', action='store_true',
+                        help='download videos even if a previous run already fetched them')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='download videos that appear in several playlists once per playlist '
+                             'instead of linking a shared copy')
+    parser.add_argument('--no-resume', action='store_true',
+                        help='start over instead of resuming an interrupted run of the same batch')
+    parser.add_argument('--sync', action='store_true',
+                        help='only download videos added to each playlist since the last sync')
+    parser.add_argument('--prune', action='store_true',
+                        help='with --sync, delete files of videos removed from the playlist')
+    parser.add_argument('--metadata-ttl', type=int, default=0, metavar='SECONDS',
+                        help='reuse cached playlist listings younger than this (default: always refetch)')
+    parser.add_argument('-r', '--limit-rate', type=argument_type(parse_rate), default=0, metavar='RATE',
+                        help='total bandwidth limit across all downloads, e.g. 2M or 500K (default: unlimited)')
+    parser.add_argument('--schedule', type=argument_type(BandwidthSchedule.parse), metavar='SPEC',
+                        help="time-of-day limits overriding --limit-rate, e.g. '09:00-18:00=2M,18:00-23:00=8M'")
+    parser.add_argument('--report', metavar='PATH',
+                        help='write a JSON run report with per-phase timings, throughput and queue depths; '
+                             'later queue batches write run-2.json, run-3.json, ... for --report run.json')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT',
+                        help='serve Prometheus metrics at http://127.0.0.1:PORT/metrics while running')
+    parser.add_argument('--log-file', help='also write the log to this rotating file')
+    parser.add_argument('-q', '--quiet', action='store_true', help='only print errors and the summary')
+    return parser.parse_args(argv)
+
+
+def configure_logging(quiet, log_file):
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    console = logging.StreamHandler(sys.stdout)
+    console.setLevel(logging.WARNING if quiet else logging.INFO)
+    logger.addHandler(console)
+    if log_file:
+        handler = logging.handlers.RotatingFileHandler(log_file, maxBytes=LOG_FILE_MAX_BYTES,
+                                                       backupCount=LOG_FILE_BACKUPS, encoding='utf-8')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        logger.addHandler(handler)
+
+
+def on_log(message, playlist_name):
+    level = logging.WARNING if message.startswith(('✗', '⚠️', 'Error', 'Could not')) else logging.INFO
+    if playlist_name != "System":
+        message = f"[{playlist_name}] {message}"
+    logger.log(level, message)
+
+
+def on_progress(current, total, percentage, playlist_name):
+    logger.info(f"[{playlist_name}] {current}/{total} videos ({percentage}%)")
+
+
+def read_commands(engine, stream):
+    """Apply commands typed while a DownloadEngine or QueueRunner runs (see the module docstring)"""
+    for line in stream:
+        command, _, argument = line.strip().partition(' ')
+        argument = argument.strip()
+        if command == 'limit':
+            try:
+                rate = parse_rate(argument)
+            except ValueError as e:
+                logger.warning(str(e))
+                continue
+            engine.bandwidth.set_rate(rate)
+            logger.warning(f"Speed limit set to {format_bytes(rate) + '/s' if rate else 'unlimited'}")
+        elif command == 'skip-playlist' and argument:
+            engine.abort_playlist(argument)
+        elif command == 'skip-video' and argument.partition(' ')[0].isdigit():
+            position, _, playlist_name = argument.partition(' ')
+            engine.abort_video(playlist_name.strip(), int(position))
+        elif command:
+            logger.warning(f"Unknown command: {line.strip()} (try 'limit 2M', 'skip-playlist NAME' "
+                           "or 'skip-video POSITION NAME')")
+
+
+def engine_options(args):
+    """DownloadEngine keyword arguments shared by direct and queued runs"""
+    return dict(max_workers=args.jobs,
+                use_archive=not args.no_archive,
+                resume=not args.no_resume,
+                metadata_ttl=args.metadata_ttl,
+                sync=args.sync,
+                prune=args.prune,
+                rate_limit=args.limit_rate,
+                schedule=args.schedule,
+                dedup=not args.no_dedup,
+                report_path=args.report,
+                metrics_port=args.metrics_port,
+                on_progress=on_progress,
+                on_log=on_log)
+
+
+def run_queue(args, urls):
+    """Add URLs and job files to the job queue, then run it unless only adding"""
+    output_path = os.path.abspath(os.path.expanduser(args.output))
+    jobs = []
+    for url in urls:
+        try:
+            jobs.append(make_job(url, args.format, output_path, args.priority))
+        except ValueError as e:
+            print(f"error: {e}", file=sys.stderr)
+    try:
+        for path in args.job_file:
+            jobs.extend(load_job_file(path, args.format, output_path, args.priority))
+    except (OSError, ValueError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    queue = JobQueue()
+    if jobs:
+        added, updated = queue.add(jobs)
+        print(f"Queued {added} new jobs, {updated} already in the queue")
+    if args.queue_add:
+        return EXIT_OK if jobs else EXIT_USAGE
+
+    configure_logging(args.quiet, args.log_file)
+    return run_to_completion(QueueRunner(queue, **engine_options(args)), args)
+
+
+def run_to_completion(runner, args):
+    """Run a DownloadEngine or QueueRunner, handling Ctrl+C and stdin commands; returns the exit status"""
+    # Run off the main thread so Ctrl+C can stop it cleanly
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(runner.run()))
+    thread.start()
+    if '-' not in args.file and sys.stdin.isatty():
+        threading.Thread(target=read_commands, args=(runner, sys.stdin), daemon=True).start()
+    try:
+        while thread.is_alive():
+            thread.join(0.5)
+    except KeyboardInterrupt:
+        logger.warning("Interrupted, stopping active downloads...")
+        runner.stop()
+        thread.join()
+        return EXIT_INTERRUPTED
+
+    print(result.get('message', ''))
+    if result.get('cancelled'):
+        return EXIT_INTERRUPTED
+    if not result.get('success'):
+        return EXIT_ERROR
+    if result.get('failed') or result.get('unresolved'):
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    urls = list(args.urls)
+    try:
+        for path in args.file:
+            urls.extend(read_playlist_file(path))
+    except OSError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.queue or args.queue_add or args.job_file:
+        return run_queue(args, urls)
+
+    # Same validation as the GUI
+    valid_urls = [url for url in urls if 'list=' in url]
+    for url in urls:
+        if url not in valid_urls:
+            print(f"error: invalid playlist URL: {url}", file=sys.stderr)
+    if not valid_urls:
+        print("error: no valid playlist URLs given", file=sys.stderr)
+        return EXIT_USAGE
+
+    configure_logging(args.quiet, args.log_file)
+
+    engine = DownloadEngine(valid_urls, args.format, args.output, **engine_options(args))
+    return run_to_completion(engine, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())